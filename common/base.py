@@ -1,12 +1,48 @@
+import operator
+from functools import reduce
 from uuid import uuid4
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django.db import models
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Prefetch, Value
 from django.utils import timezone
 from django_currentuser.db.models import CurrentUserField
 from rest_framework import serializers
 
 
+def deletion_blockers(model):
+    """
+    Relations whose rows keep a ``model`` row from being deleted: named,
+    many-valued ones. Models holding only data derived from the row set
+    ``blocks_deletion = False`` and are left out.
+    """
+    return [
+        relation for relation in model._meta.related_objects
+        if relation.related_name
+        and not relation.one_to_one
+        and getattr(relation.related_model, "blocks_deletion", True)
+    ]
+
+
+def can_delete_expression(model, ref="pk"):
+    """
+    ``GenericModel.can_delete`` as an expression: no row of a
+    ``deletion_blockers`` relation points at ``OuterRef(ref)``.
+    """
+    blockers = []
+    for relation in deletion_blockers(model):
+        related = relation.related_model._base_manager.filter(
+            **{relation.field.name: OuterRef(ref)}
+        )
+        blockers.append(~Exists(related))
+    if not blockers:
+        return Value(True)
+    return ExpressionWrapper(
+        reduce(operator.and_, blockers),
+        output_field=BooleanField()
+    )
+
+
 class SoftDeleteQuerySet(models.QuerySet):
     def delete(self):
         return super().update(_is_deleted=True, _deleted_at=timezone.now())
@@ -20,21 +56,33 @@ class SoftDeleteQuerySet(models.QuerySet):
     def dead(self):
         return self.filter(_is_deleted=True)
 
+    def annotate_can_delete(self):
+        """
+        Annotates ``_can_delete`` with one EXISTS subquery per relation
+        instead of the per-object queries of ``GenericModel.can_delete``.
+        """
+        return self.annotate(_can_delete=can_delete_expression(self.model))
+
 class SoftDeleteManager(models.Manager):
+    queryset_class = SoftDeleteQuerySet
+
     def __init__(self, *args, **kwargs):
         self.alive_only = kwargs.pop('alive_only', None)
         super().__init__(*args, **kwargs)
 
     def get_queryset(self):
+        queryset = self.queryset_class(self.model, using=self._db)
         if self.alive_only is True:
-            return SoftDeleteQuerySet(self.model).filter(_is_deleted=False)
+            return queryset.filter(_is_deleted=False)
         if self.alive_only is False:
-            return SoftDeleteQuerySet(self.model).filter(_is_deleted=True)
-        if self.alive_only is None:
-            return SoftDeleteQuerySet(self.model)
+            return queryset.filter(_is_deleted=True)
+        return queryset
 
     def hard_delete(self):
         return self.get_queryset().hard_delete()
+
+    def annotate_can_delete(self):
+        return self.get_queryset().annotate_can_delete()
     
 class GenericModel(models.Model):
     id = models.UUIDField(
@@ -83,9 +131,6 @@ class GenericModel(models.Model):
         
     class Meta:
         abstract = True
-        indexes = (
-            models.Index(fields=['id'], name='%(class)s_id_idx'),
-        )
     @property
     def created_by(self):
         if self._created_by:
@@ -100,7 +145,7 @@ class GenericModel(models.Model):
 
     @cached_property
     def can_delete(self):
-        for field in self._meta.related_objects:
+        for field in deletion_blockers(type(self)):
             try:
                 if getattr(self, field.related_name).all().exists():
                     return False
@@ -109,6 +154,27 @@ class GenericModel(models.Model):
         return True
     
     
+class RowFallback(Exception):
+    """
+    Raised by a row representation that can't reproduce the serializer for
+    this data; the caller serializes model instances instead.
+    """
+
+
+def user_display_row(pk, first_name, last_name):
+    if pk is None:
+        return None
+    name = f"{first_name} {last_name}".strip()
+    if not name:
+        # the serializer falls back to ``user.mobile`` here
+        raise RowFallback
+    return name
+
+
+def user_id_row(pk):
+    return None if pk is None else str(pk)
+
+
 class GenericModelSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     created_by = serializers.SerializerMethodField()
@@ -117,7 +183,41 @@ class GenericModelSerializer(serializers.ModelSerializer):
     updated_at = serializers.SerializerMethodField()
     _created_by = serializers.SerializerMethodField()
     _updated_by = serializers.SerializerMethodField()
-    can_delete = serializers.ReadOnlyField()
+    can_delete = serializers.SerializerMethodField()
+
+    # Relations read per object while serializing. Views run their queryset
+    # through ``setup_eager_loading`` so they are fetched once per page.
+    select_related_fields = ("_created_by", "_updated_by")
+    prefetch_related_fields = ()
+    # Model attributes read by fields whose source doesn't say, e.g. method
+    # fields. A field that reads an unlisted property disables deferring.
+    field_sources = {
+        "_created_by": ("_created_by",),
+        "created_by": ("_created_by",),
+        "_updated_by": ("_updated_by",),
+        "updated_by": ("_updated_by",),
+    }
+    # columns kept whatever the fieldset, cursor pagination reads them
+    always_loaded_fields = ("_created_at",)
+    # How ``common.rows`` builds method fields from ``values()`` rows:
+    # ``{field name: (value paths, function of those values)}``.
+    row_fields = {
+        "_created_by": (
+            ("_created_by", "_created_by__first_name", "_created_by__last_name"),
+            user_display_row,
+        ),
+        "created_by": (
+            ("_created_by", "_created_by__first_name", "_created_by__last_name"),
+            user_display_row,
+        ),
+        "_updated_by": (("_updated_by",), user_id_row),
+        "updated_by": (
+            ("_updated_by", "_updated_by__first_name", "_updated_by__last_name"),
+            user_display_row,
+        ),
+        "created_at": ((), lambda: None),
+        "updated_at": ((), lambda: None),
+    }
 
     class Meta:
         model = None
@@ -133,6 +233,127 @@ class GenericModelSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fieldset is not None:
+            for name in list(self.fields):
+                if name not in fieldset:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_field_sources(cls):
+        """
+        ``{field name: model attributes it reads}`` for the readable fields,
+        ``None`` when that is not known.
+        """
+        if "_field_sources" not in cls.__dict__:
+            sources = {}
+            for name, field in cls().fields.items():
+                if field.write_only:
+                    continue
+                if name in cls.field_sources:
+                    sources[name] = tuple(cls.field_sources[name])
+                elif isinstance(field, serializers.SerializerMethodField):
+                    sources[name] = ()
+                elif field.source == "*":
+                    sources[name] = None
+                else:
+                    sources[name] = (field.source.split(".")[0],)
+            cls._field_sources = sources
+        return cls._field_sources
+
+    @classmethod
+    def get_deferred_fields(cls, attributes):
+        """
+        Concrete columns none of ``attributes`` need, or ``None`` if one of
+        them is a model attribute that may read any column.
+        """
+        opts = cls.Meta.model._meta
+        names = {field.name for field in opts.get_fields()}
+        for attribute in attributes:
+            if attribute not in names and hasattr(cls.Meta.model, attribute):
+                return None
+        keep = set(attributes) | set(cls.always_loaded_fields)
+        return [
+            field.name for field in opts.concrete_fields
+            if not field.primary_key and field.name not in keep
+        ]
+
+    @classmethod
+    def _nested_serializer_class(cls, name):
+        field = cls._declared_fields.get(name)
+        field = getattr(field, "child", field)
+        if isinstance(field, GenericModelSerializer):
+            return type(field)
+        return None
+
+    @classmethod
+    def get_select_related(cls, prefix=""):
+        lookups = []
+        for name in cls.select_related_fields:
+            lookups.append(prefix + name)
+            nested = cls._nested_serializer_class(name)
+            if nested is not None:
+                lookups.extend(nested.get_select_related(f"{prefix}{name}__"))
+        return lookups
+
+    @classmethod
+    def get_prefetch_related(cls, prefix=""):
+        lookups = []
+        for name in cls.select_related_fields:
+            nested = cls._nested_serializer_class(name)
+            if nested is not None:
+                lookups.extend(nested.get_prefetch_related(f"{prefix}{name}__"))
+        for name in cls.prefetch_related_fields:
+            nested = cls._nested_serializer_class(name)
+            if nested is None:
+                lookups.append(prefix + name)
+                continue
+            # related managers don't hide soft-deleted rows, so neither do we
+            queryset = nested.setup_eager_loading(nested.Meta.model.all_objects.all())
+            lookups.append(Prefetch(prefix + name, queryset=queryset))
+        return lookups
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fieldset=None):
+        """
+        With a ``fieldset`` only the relations and columns those fields read
+        are fetched; everything else is deferred.
+        """
+        select_related = cls.get_select_related()
+        prefetch_related = cls.get_prefetch_related()
+        annotate_can_delete = "can_delete" in cls.Meta.fields
+        if fieldset is not None:
+            sources = cls.get_field_sources()
+            attributes = set()
+            deferrable = True
+            for name in fieldset:
+                if name not in sources:
+                    continue
+                if sources[name] is None:
+                    deferrable = False
+                else:
+                    attributes.update(sources[name])
+            select_related = [
+                lookup for lookup in select_related
+                if lookup.split("__")[0] in attributes
+            ]
+            prefetch_related = [
+                lookup for lookup in prefetch_related
+                if getattr(lookup, "prefetch_through", lookup).split("__")[0] in attributes
+            ]
+            annotate_can_delete = annotate_can_delete and "can_delete" in fieldset
+            deferred = cls.get_deferred_fields(attributes) if deferrable else None
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if annotate_can_delete and hasattr(queryset, "annotate_can_delete"):
+            queryset = queryset.annotate_can_delete()
+        return queryset
+
     def get__created_by(self, obj):
         user = getattr(obj, "_created_by", None)
         if not user or hasattr(user, "all"):
@@ -167,6 +388,12 @@ class GenericModelSerializer(serializers.ModelSerializer):
             return None
         return str(user.id)
 
+    def get_can_delete(self, obj):
+        can_delete = getattr(obj, "_can_delete", None)
+        if can_delete is None:
+            return obj.can_delete
+        return can_delete
+
     def get_created_at(self, obj):
         return getattr(obj, "created_at", None)
 
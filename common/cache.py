@@ -0,0 +1,111 @@
+import time
+from uuid import uuid4
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = "version"
+
+
+def version_key(*parts):
+    return ":".join((VERSION_PREFIX,) + tuple(str(part) for part in parts))
+
+
+def dependency_key(model, pk):
+    return version_key(model._meta.label_lower, pk)
+
+
+def get_versions(keys):
+    """
+    Current version of each dependency key; keys the cache doesn't know yet
+    get a fresh version so later bumps can be told apart.
+    """
+    keys = list(keys)
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump_versions(keys):
+    cache.set_many({key: uuid4().hex for key in keys}, None)
+
+
+def bump_versions_on_commit(keys, using=None):
+    keys = list(keys)
+    transaction.on_commit(lambda: bump_versions(keys), using=using)
+
+
+class VersionedCache:
+    """
+    Cache of payloads that stay valid while the version of every dependency
+    key they were built from is unchanged, so invalidating means bumping one
+    version key instead of finding and deleting entries.
+
+    Only one worker rebuilds a stale entry at a time; the others keep serving
+    the stale payload, or wait up to ``wait_timeout`` seconds when there is
+    none.
+    """
+
+    def __init__(self, prefix, timeout=300, lock_timeout=10, wait_timeout=2.0, poll_interval=0.05):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def make_key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def is_fresh(self, entry):
+        dependencies = entry["dependencies"]
+        return cache.get_many(list(dependencies)) == dependencies
+
+    def get(self, key):
+        entry = cache.get(self.make_key(key))
+        if entry is not None and self.is_fresh(entry):
+            return entry["payload"]
+        return None
+
+    def set(self, key, payload, versions):
+        """
+        ``versions`` is the ``get_versions`` snapshot taken before the
+        payload was read, so a bump that races the build leaves the entry
+        stale instead of marking old data current.
+        """
+        entry = {
+            "payload": payload,
+            "dependencies": versions,
+        }
+        cache.set(self.make_key(key), entry, self.timeout)
+
+    def get_or_build(self, key, dependency_keys, build):
+        """
+        ``dependency_keys()`` returns the version keys the payload depends
+        on and ``build()`` the payload; the versions are read in between.
+        """
+        cache_key = self.make_key(key)
+        entry = cache.get(cache_key)
+        if entry is not None and self.is_fresh(entry):
+            return entry["payload"]
+
+        lock_key = f"{cache_key}:lock"
+        if not cache.add(lock_key, 1, self.lock_timeout):
+            if entry is not None:
+                return entry["payload"]
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                payload = self.get(key)
+                if payload is not None:
+                    return payload
+            return build()
+
+        try:
+            versions = get_versions(dependency_keys())
+            payload = build()
+            self.set(key, payload, versions)
+            return payload
+        finally:
+            cache.delete(lock_key)
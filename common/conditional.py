@@ -0,0 +1,39 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def content_etag(content):
+    """
+    Strong ETag of a rendered body. Anything that changes the bytes, related
+    rows included, changes the tag.
+    """
+    return quote_etag(hashlib.sha1(content).hexdigest())
+
+
+def not_modified_response(request, etag=None, last_modified=None, response=None):
+    """
+    Returns the 304 (or 412) response the request's conditional headers call
+    for, or ``None`` when the full response has to be sent. ``response``
+    passes its caching headers (``Vary``, ``Cache-Control``) on to the 304.
+    """
+    if request.method not in SAFE_METHODS:
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=timestamp, response=response
+    )
+    if not_modified is response:
+        return None
+    set_validators(not_modified, etag, last_modified)
+    return not_modified
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag and not response.has_header("ETag"):
+        response["ETag"] = etag
+    if last_modified and not response.has_header("Last-Modified"):
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
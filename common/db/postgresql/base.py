@@ -0,0 +1,20 @@
+import time
+from django.db.backends.postgresql import base
+from common.db.stats import connection_stats
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The postgresql backend, recording how long getting a connection takes
+    in ``connection_stats``.
+    """
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            connection_stats.record(self.alias, time.perf_counter() - start, failed=True)
+            raise
+        connection_stats.record(self.alias, time.perf_counter() - start)
+        return connection
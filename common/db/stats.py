@@ -0,0 +1,78 @@
+import threading
+from django.db import connections
+
+
+class ConnectionStats:
+    """
+    Per process count and timing of getting database connections by alias:
+    the connect time without a pool, the wait for a free connection with
+    one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, alias, seconds, failed=False):
+        milliseconds = seconds * 1000
+        with self._lock:
+            stats = self._stats.setdefault(
+                alias, {"acquired": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            stats["failed" if failed else "acquired"] += 1
+            stats["total_ms"] += milliseconds
+            stats["max_ms"] = max(stats["max_ms"], milliseconds)
+
+    def get(self, alias):
+        with self._lock:
+            stats = dict(self._stats.get(alias, {}))
+        if not stats:
+            return {"acquired": 0, "failed": 0, "avg_ms": None, "max_ms": None}
+        attempts = stats["acquired"] + stats["failed"]
+        return {
+            "acquired": stats["acquired"],
+            "failed": stats["failed"],
+            "avg_ms": round(stats.pop("total_ms") / attempts, 3),
+            "max_ms": round(stats["max_ms"], 3),
+        }
+
+
+connection_stats = ConnectionStats()
+
+
+def pool_stats(alias="default"):
+    """
+    Size, saturation and wait times of the alias's psycopg pool since it
+    was opened, ``None`` when it isn't pooled.
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    queued = stats.get("requests_queued", 0)
+    return {
+        "min_size": stats.get("pool_min"),
+        "max_size": stats.get("pool_max"),
+        "size": stats.get("pool_size", 0),
+        "in_use": in_use,
+        # share of the most connections the pool may open that are busy
+        "saturation": round(in_use / stats["pool_max"], 3) if stats.get("pool_max") else None,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        # requests that found no free connection and had to wait
+        "queued": queued,
+        "wait_ms_avg": round(stats.get("requests_wait_ms", 0) / queued, 3) if queued else 0,
+        "timeouts": stats.get("requests_errors", 0),
+    }
+
+
+def database_stats(alias="default"):
+    connection = connections[alias]
+    return {
+        "vendor": connection.vendor,
+        "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+        "health_checks": connection.settings_dict.get("CONN_HEALTH_CHECKS"),
+        "connections": connection_stats.get(alias),
+        "pool": pool_stats(alias),
+    }
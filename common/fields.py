@@ -0,0 +1,26 @@
+from django.core.exceptions import ValidationError
+from rest_framework import serializers
+
+
+class BatchPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    ``PrimaryKeyRelatedField`` that resolves from ``context["related_lookups"]``
+    (``{model: {pk: obj}}``) when the caller preloaded the objects for a whole
+    batch, and queries per value as usual otherwise.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        lookups = self.context.get("related_lookups") or {}
+        if model not in lookups:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = model._meta.pk.to_python(data)
+        except ValidationError:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        obj = lookups[model].get(pk)
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
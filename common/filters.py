@@ -0,0 +1,24 @@
+from rest_framework.filters import OrderingFilter
+
+
+class AliasedOrderingFilter(OrderingFilter):
+    """
+    ``OrderingFilter`` that also takes the public names in the view's
+    ``ordering_aliases``, e.g. ``?ordering=-created_at`` for
+    ``-_created_at``.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if params:
+            aliases = getattr(view, "ordering_aliases", {})
+            fields = []
+            for param in params.split(","):
+                term = param.strip()
+                prefix = "-" if term.startswith("-") else ""
+                name = term[len(prefix):]
+                fields.append(prefix + aliases.get(name, name))
+            ordering = self.remove_invalid_fields(queryset, fields, view, request)
+            if ordering:
+                return ordering
+        return self.get_default_ordering(view)
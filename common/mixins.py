@@ -0,0 +1,154 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from common.base import RowFallback
+from common.conditional import content_etag, not_modified_response, set_validators
+from common.paginations import CustomCursorPagination
+from common.rows import get_row_plan
+
+
+class EagerLoadingMixin:
+    """
+    Applies the serializer's eager-loading declaration to the view queryset.
+    """
+
+    def get_serializer_fieldset(self):
+        return None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, "setup_eager_loading"):
+            fieldset = self.get_serializer_fieldset()
+            if fieldset is None:
+                queryset = serializer_class.setup_eager_loading(queryset)
+            else:
+                queryset = serializer_class.setup_eager_loading(queryset, fieldset=fieldset)
+        return queryset
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=title,slug`` / ``?exclude=body`` trim read responses to the
+    named top-level fields; unknown names are a 400. Combined with
+    ``EagerLoadingMixin`` (listed after it) the queryset only fetches what
+    those fields read, and columns no field reads are deferred even without
+    the parameters.
+    """
+    fields_query_param = "fields"
+    exclude_query_param = "exclude"
+
+    def get_field_names(self, param, known):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = names - known
+        if unknown:
+            raise ValidationError({param: [f"Unknown field: {name}." for name in sorted(unknown)]})
+        return names
+
+    def get_serializer_fieldset(self):
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, "get_field_sources"):
+            return None
+        fieldset = set(serializer_class.get_field_sources())
+        known = set(fieldset)
+        fields = self.get_field_names(self.fields_query_param, known)
+        if fields is not None:
+            fieldset &= fields
+        exclude = self.get_field_names(self.exclude_query_param, known)
+        if exclude is not None:
+            fieldset -= exclude
+        return fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_serializer_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault("fieldset", fieldset)
+        return super().get_serializer(*args, **kwargs)
+
+
+class RowListMixin:
+    """
+    Serves ``list`` from ``values()`` rows through the serializer's compiled
+    ``RowPlan`` instead of model instances and serializer fields, with the
+    same output. Serializers or rows the plan can't reproduce take the
+    regular path.
+    """
+    # read by pagination from the rows, cursor pagination needs these
+    row_extra_fields = ("_created_at",)
+
+    def get_row_plan(self):
+        fieldset = None
+        if hasattr(self, "get_serializer_fieldset"):
+            fieldset = self.get_serializer_fieldset()
+        return get_row_plan(
+            self.get_serializer_class(),
+            frozenset(fieldset) if fieldset is not None else None
+        )
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_row_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = plan.values(queryset, *self.row_extra_fields)
+        page = self.paginate_queryset(rows)
+        try:
+            data = plan.serialize(rows if page is None else page, request)
+        except RowFallback:
+            return super().list(request, *args, **kwargs)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class CursorPaginationMixin:
+    """
+    Lets a request opt into keyset pagination with ``?pagination=cursor``
+    (first page) or ``?cursor=<token>`` (following pages); everything else
+    keeps the view's ``pagination_class``.
+    """
+    cursor_pagination_class = CustomCursorPagination
+
+    def use_cursor_pagination(self):
+        params = self.request.query_params
+        return (
+            self.cursor_pagination_class is not None and
+            (params.get("pagination") == "cursor" or
+             self.cursor_pagination_class.cursor_query_param in params)
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.use_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+class ConditionalGetMixin:
+    """
+    Adds an ETag hashed from the rendered body to successful GET/HEAD
+    responses and answers a matching ``If-None-Match`` with 304. It costs no
+    query, and every change that shows up in the body changes the tag.
+    Responses that already carry an ETag are left alone.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            request.method not in SAFE_METHODS
+            or response.status_code != 200
+            or response.streaming
+            or response.has_header("ETag")
+            or not hasattr(response, "render")
+        ):
+            return response
+        response.render()
+        etag = content_etag(response.content)
+        set_validators(response, etag)
+        return not_modified_response(request, etag, response=response) or response
@@ -1,4 +1,14 @@
-from rest_framework.pagination import LimitOffsetPagination
+import base64
+import hashlib
+import json
+from collections.abc import Mapping
+from datetime import datetime
+from uuid import UUID
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
 from rest_framework.response import Response
 
 def _positive_int(integer_string):
@@ -8,20 +18,94 @@ def _positive_int(integer_string):
     return ret
 
 class CustomLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with a selectable strategy for ``total_items``:
+
+    * ``exact``: ``COUNT(*)`` on every call.
+    * ``estimate``: planner row estimate on PostgreSQL for unfiltered
+      requests, exact otherwise.
+    * ``cached``: exact count cached per query signature for
+      ``count_cache_timeout`` seconds.
+    * ``none``: no count at all, totals are returned as ``None``.
+
+    Views set a default with ``count_strategy`` and clients may pick one of
+    ``count_strategies`` with ``?count=``.
+    """
     limit_query_param = 'limit'
     offset_query_param = 'offset'
+    count_query_param = 'count'
+    count_strategy = 'exact'
+    count_strategies = ('exact', 'estimate', 'cached', 'none')
+    count_cache_timeout = 60
+    # below this the estimate is too coarse and COUNT(*) is cheap anyway
+    estimate_threshold = 10000
+    # query params that don't narrow the result set
+    unfiltered_query_params = (
+        'limit', 'offset', 'count', 'ordering', 'pagination',
+        'fields', 'exclude',
+    )
 
     def paginate_queryset(self, queryset, request, view=None):
         self.limit = self.get_limit(request)
         if self.limit is None:
             return None
-        self.count = self.get_count(queryset)
         self.offset = self.get_offset(request)
         self.request = request
+        self.strategy = self.get_count_strategy(request, view)
+        self.count = self.get_strategy_count(queryset)
 
-        if self.count == 0 or self.offset >= self.count:
+        # approximate counts must not hide rows that do exist
+        if self.strategy == 'exact' and (self.count == 0 or self.offset >= self.count):
             return []
         return list(queryset[self.offset:self.offset + self.limit])
+
+    def get_count_strategy(self, request, view=None):
+        strategy = request.query_params.get(self.count_query_param)
+        if strategy in self.count_strategies:
+            return strategy
+        return getattr(view, 'count_strategy', self.count_strategy)
+
+    def get_strategy_count(self, queryset):
+        if self.strategy == 'none':
+            return None
+        if self.strategy == 'cached':
+            return self.get_cached_count(queryset)
+        if self.strategy == 'estimate' and not self.is_filtered(self.request):
+            estimate = self.get_estimated_count(queryset)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return self.get_count(queryset)
+
+    def is_filtered(self, request):
+        return any(
+            key not in self.unfiltered_query_params
+            for key in request.query_params
+        )
+
+    def get_cached_count(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        signature = hashlib.md5(
+            repr((queryset.db, sql, params)).encode('utf-8')
+        ).hexdigest()
+        key = f'pagination-count:{signature}'
+        count = cache.get(key)
+        if count is None:
+            count = self.get_count(queryset)
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_estimated_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
     def get_offset(self, request):
         try:
             return _positive_int(request.query_params[self.offset_query_param])
@@ -38,12 +122,16 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
         return self.default_limit
 
     def get_paginated_response(self, data):
-        pages_count = (
-            0 if self.count == 0 else (self.count + self.limit - 1) // self.limit
-        )
-        current_page = (
-            0 if self.count == 0 else (self.offset // self.limit) + 1
-        )
+        if self.count is None:
+            pages_count = None
+            current_page = (self.offset // self.limit) + 1
+        else:
+            pages_count = (
+                0 if self.count == 0 else (self.count + self.limit - 1) // self.limit
+            )
+            current_page = (
+                0 if self.count == 0 else (self.offset // self.limit) + 1
+            )
 
         return Response({
             'pages_count': pages_count,
@@ -52,4 +140,110 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
             'current_page': current_page,
             'total_items': self.count,
             'items': data,
-        })
\ No newline at end of file
+        })
+
+class CustomCursorPagination(BasePagination):
+    """
+    Keyset pagination on ``(_created_at, id)``, newest first.
+
+    Every page is a plain index range scan, so deep pages cost the same as
+    the first one. Totals are not computed, the envelope keeps the same keys
+    as ``CustomLimitOffsetPagination`` with ``None`` for the counts.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 20
+    max_limit = 100
+    ordering = ('-_created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            reverse = False
+        else:
+            created_at, pk, reverse = self.cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(_created_at__gt=created_at) |
+                    Q(_created_at=created_at, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(_created_at__lt=created_at) |
+                    Q(_created_at=created_at, id__lt=pk)
+                )
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(field.lstrip('-') for field in ordering)
+        results = list(queryset.order_by(*ordering)[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.page = results
+        return results
+
+    def get_limit(self, request):
+        try:
+            limit = _positive_int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            created_at = datetime.fromisoformat(payload['c'])
+            pk = UUID(payload['i'])
+            return created_at, pk, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse=False):
+        if isinstance(instance, Mapping):
+            # values() rows, see common.rows
+            created_at, pk = instance['_created_at'], instance['id']
+        else:
+            created_at, pk = instance._created_at, instance.pk
+        payload = {'c': created_at.isoformat(), 'i': str(pk)}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode('ascii')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'pages_count': None,
+            'items_per_page': self.limit,
+            'current_page_items_count': len(data),
+            'current_page': None,
+            'total_items': None,
+            'next_cursor': self.get_next_cursor(),
+            'previous_cursor': self.get_previous_cursor(),
+            'items': data,
+        })
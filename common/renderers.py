@@ -0,0 +1,36 @@
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` with the same bytes for compact output, encoded by
+    orjson (in requirements.txt). Without it every response falls back to
+    ``JSONRenderer``. Datetimes and anything orjson doesn't know go through
+    DRF's encoder; data orjson rejects (non-string keys, huge ints, lone
+    surrogates) and indented output use ``JSONRenderer`` itself.
+
+    Floats are where the two differ: orjson keeps the same digits but
+    writes exponents without padding (``1e-7`` instead of ``1e-07``), and
+    writes NaN and infinities as ``null`` where ``JSONRenderer`` raises.
+    """
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or
+            self.ensure_ascii or not self.compact or
+            self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same strict javascript subset as JSONRenderer
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -0,0 +1,242 @@
+from collections import defaultdict
+from functools import lru_cache
+from uuid import UUID
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+from common.base import RowFallback, can_delete_expression
+
+# returned by a compiled field that the serializer would leave out
+SKIP = object()
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def pk_representation(value):
+    # the renderer writes UUID primary keys as str()
+    return str(value) if isinstance(value, UUID) else value
+
+
+class RowPlan:
+    """
+    A serializer compiled into the ``values()`` paths it needs and one
+    getter per field that turns a row into the same dict as
+    ``serializer.data``, without model instances or per-field
+    ``get_attribute``/``to_representation`` dispatch.
+    """
+
+    def __init__(self, serializer_class, fieldset=None, prefix="", root=None):
+        self.model = serializer_class.Meta.model
+        self.prefix = prefix
+        # nested single objects come from the same rows as their parent
+        self.root = root or self
+        if root is None:
+            self.paths = set()
+            self.annotations = {}
+            # (parent pk path, FK name on the child model, child plan)
+            self.children = []
+        # named like the pk field so an ``id`` field shares the column
+        self.pk_path = self.path(self.model._meta.pk.name)
+
+        serializer = serializer_class()
+        self.steps = tuple(
+            (name, self.compile_field(serializer_class, name, field))
+            for name, field in serializer.fields.items()
+            if not field.write_only and (fieldset is None or name in fieldset)
+        )
+
+    def path(self, path):
+        path = self.prefix + path
+        self.root.paths.add(path)
+        return path
+
+    def annotate(self, expression):
+        alias = f"_row_{len(self.root.annotations)}"
+        self.root.annotations[alias] = expression
+        return alias
+
+    def to_dict(self, row, request):
+        item = {}
+        for name, getter in self.steps:
+            value = getter(row, request)
+            if value is not SKIP:
+                item[name] = value
+        return item
+
+    def missing(self, field):
+        # what Field.get_attribute does when the source attribute is missing
+        if field.default is not empty:
+            default = field.get_default()
+            return lambda row, request: default
+        if field.allow_null:
+            return lambda row, request: None
+        if not field.required:
+            return lambda row, request: SKIP
+        raise UnsupportedField(field.field_name)
+
+    def compile_field(self, serializer_class, name, field):
+        """
+        A ``getter(row, request)`` returning the field's representation, or
+        ``SKIP`` when the serializer would leave the key out.
+        """
+        row_fields = getattr(serializer_class, "row_fields", {})
+        if name in row_fields:
+            paths, function = row_fields[name]
+            keys = [self.path(path) for path in paths]
+            return lambda row, request: function(*[row[key] for key in keys])
+        if isinstance(field, serializers.SerializerMethodField):
+            if name == "can_delete":
+                key = self.annotate(can_delete_expression(self.model, ref=self.prefix + "pk"))
+                return lambda row, request: row[key]
+            raise UnsupportedField(name)
+        if field.source == "*":
+            raise UnsupportedField(name)
+        if isinstance(field, serializers.ListSerializer):
+            return self.compile_many(field)
+        return self.compile_source(field)
+
+    def compile_many(self, field):
+        relation = model_field(self.model, field.source)
+        if relation is None or not relation.one_to_many:
+            raise UnsupportedField(field.field_name)
+        child = RowPlan(type(field.child))
+        fk_name = relation.field.name
+        child.paths.add(fk_name)
+        index = len(self.root.children)
+        self.root.children.append((self.pk_path, fk_name, child))
+        return lambda row, request: row["_row_children"][index]
+
+    def compile_source(self, field):
+        model = self.model
+        path = ""
+        presence = []
+        attrs = field.source_attrs
+        for index, attr in enumerate(attrs):
+            target = model_field(model, attr)
+            if target is None:
+                if hasattr(model, attr):
+                    # a property or method, could read anything
+                    raise UnsupportedField(field.field_name)
+                return self.missing(field)
+            if index == len(attrs) - 1:
+                break
+            if not (target.many_to_one or target.one_to_one) or target.auto_created:
+                raise UnsupportedField(field.field_name)
+            presence.append(self.path(path + attr))
+            path += attr + "__"
+            model = target.related_model
+        attr = attrs[-1]
+
+        if isinstance(field, serializers.BaseSerializer):
+            if not (target.many_to_one or target.one_to_one) or target.auto_created:
+                raise UnsupportedField(field.field_name)
+            child = RowPlan(type(field), prefix=self.prefix + path + attr + "__", root=self.root)
+            # the related pk is the FK column, no join needed to test it
+            pk_path, child_to_dict = child.pk_path, child.to_dict
+
+            def getter(row, request):
+                return None if row[pk_path] is None else child_to_dict(row, request)
+        else:
+            getter = self.compile_value(field, target, self.path(path + attr))
+
+        if not presence:
+            return getter
+        missing, value = self.missing(field), getter
+
+        def getter(row, request):
+            if any(row[key] is None for key in presence):
+                return missing(row, request)
+            return value(row, request)
+        return getter
+
+    def compile_value(self, field, target, key):
+        if isinstance(field, serializers.FileField):
+            if not getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL):
+                raise UnsupportedField(field.field_name)
+            url = target.storage.url
+
+            def file_url(row, request):
+                name = row[key]
+                if not name:
+                    return None
+                return request.build_absolute_uri(url(name)) if request is not None else url(name)
+            return file_url
+        if isinstance(field, serializers.RelatedField):
+            if type(field) is not PrimaryKeyRelatedField or field.pk_field is not None:
+                raise UnsupportedField(field.field_name)
+            return lambda row, request: pk_representation(row[key])
+        if isinstance(target, (models.ForeignObjectRel, models.ManyToManyField)):
+            raise UnsupportedField(field.field_name)
+        if isinstance(field, serializers.UUIDField) and field.uuid_format == "hex_verbose":
+            to_representation = str
+        elif isinstance(field, serializers.BooleanField):
+            to_representation = bool
+        else:
+            to_representation = field.to_representation
+
+        def representation(row, request):
+            value = row[key]
+            return None if value is None else to_representation(value)
+        return representation
+
+    def values(self, queryset, *extra):
+        """
+        ``queryset`` as rows carrying every path the plan reads.
+        """
+        queryset = queryset.prefetch_related(None)
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*self.paths, *self.annotations, *extra)
+
+    def attach_children(self, rows, request):
+        if not self.children:
+            return
+        for row in rows:
+            row["_row_children"] = [[] for child in self.children]
+        for index, (parent_key, fk_name, child) in enumerate(self.children):
+            by_parent = defaultdict(list)
+            for row in rows:
+                by_parent[row[parent_key]].append(row)
+            if not by_parent:
+                continue
+            child_rows = list(child.values(
+                child.model._base_manager.filter(**{f"{fk_name}__in": list(by_parent)})
+            ))
+            child.attach_children(child_rows, request)
+            to_dict = child.to_dict
+            for child_row in child_rows:
+                for row in by_parent.get(child_row[fk_name], ()):
+                    row["_row_children"][index].append(to_dict(child_row, request))
+
+    def serialize(self, rows, request=None):
+        """
+        Raises ``RowFallback`` when a row needs the serializer after all.
+        """
+        rows = list(rows)
+        self.attach_children(rows, request)
+        to_dict = self.to_dict
+        return [to_dict(row, request) for row in rows]
+
+
+@lru_cache(maxsize=128)
+def get_row_plan(serializer_class, fieldset=None):
+    """
+    The compiled plan for ``serializer_class`` limited to ``fieldset`` (a
+    frozenset), or ``None`` when a field can't be read from rows.
+    """
+    try:
+        return RowPlan(serializer_class, fieldset)
+    except UnsupportedField:
+        return None
@@ -0,0 +1,90 @@
+from functools import reduce
+import operator
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+# room kept for a "-<n>" suffix when a base slug is cut to fit max_length
+SUFFIX_RESERVE = 7
+SAVE_ATTEMPTS = 5
+
+
+def _slug_base(model, value, slug_field):
+    max_length = model._meta.get_field(slug_field).max_length
+    base = slugify(value or "", allow_unicode=True) or model._meta.model_name
+    base = base[:max_length].strip("-")
+    if len(base) + SUFFIX_RESERVE > max_length:
+        stem = base[:max_length - SUFFIX_RESERVE].strip("-")
+    else:
+        stem = base
+    return base, stem
+
+
+def _taken_suffixes(slugs, stem):
+    prefix = f"{stem}-"
+    suffixes = set()
+    for slug in slugs:
+        if slug.startswith(prefix) and slug[len(prefix):].isdigit():
+            suffixes.add(int(slug[len(prefix):]))
+    return suffixes
+
+
+def allocate_slugs(model, values, slug_field="slug", using=None, reserved=()):
+    """
+    Returns a free slug for each of ``values`` with a single query.
+
+    A taken slug gets the next free ``-2``, ``-3``... suffix; slugs handed out
+    in the same call never collide with each other. Soft-deleted rows count
+    as taken since the unique constraint still sees them, and so do
+    ``reserved`` slugs that are about to be written.
+    """
+    values = list(values)
+    if not values:
+        return []
+    bases = [_slug_base(model, value, slug_field) for value in values]
+    conditions = set()
+    for base, stem in bases:
+        conditions.add(Q(**{slug_field: base}))
+        conditions.add(Q(**{f"{slug_field}__startswith": f"{stem}-"}))
+    taken = set(
+        model._base_manager.using(using or router.db_for_read(model))
+        .filter(reduce(operator.or_, conditions))
+        .values_list(slug_field, flat=True)
+    )
+    taken.update(reserved)
+
+    slugs = []
+    for base, stem in bases:
+        if base not in taken:
+            slug = base
+        else:
+            suffix = max(_taken_suffixes(taken, stem) | {1}) + 1
+            slug = f"{stem}-{suffix}"
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def allocate_slug(model, value, slug_field="slug", using=None):
+    return allocate_slugs(model, [value], slug_field=slug_field, using=using)[0]
+
+
+def save_with_unique_slug(instance, value, save, *args, slug_field="slug", **kwargs):
+    """
+    Allocates a slug from ``value`` and calls ``save``; if a concurrent
+    writer took the same slug first, allocates again and retries.
+    """
+    model = type(instance)
+    using = kwargs.get("using") or router.db_for_write(model, instance=instance)
+    for attempt in range(SAVE_ATTEMPTS):
+        slug = allocate_slug(model, value, slug_field=slug_field, using=using)
+        setattr(instance, slug_field, slug)
+        try:
+            with transaction.atomic(using=using):
+                return save(*args, **kwargs)
+        except IntegrityError:
+            slug_taken = model._base_manager.using(using).filter(
+                **{slug_field: slug}
+            ).exists()
+            if not slug_taken or attempt == SAVE_ATTEMPTS - 1:
+                raise
@@ -0,0 +1,43 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+# seconds a bucket stays locked if its holder dies before releasing it
+LOCK_TIMEOUT = 2
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket on top of DRF's scoped rates: ``"5/min"`` is a bucket of
+    5 tokens refilled at 5 per minute, so a client can burst up to the
+    capacity and then keeps a steady rate. The bucket lives in the cache
+    under the usual ``throttle_<scope>_<ident>`` key.
+
+    The read and write of a bucket happen under a short lock taken with
+    ``cache.add``, so concurrent requests can't spend the same token. A
+    request that finds the bucket locked is throttled rather than waiting.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        lock_key = f"{self.key}:lock"
+        if not self.cache.add(lock_key, 1, LOCK_TIMEOUT):
+            self.tokens = 0
+            return self.throttle_failure()
+        try:
+            tokens, updated_at = self.cache.get(self.key, (self.num_requests, self.now))
+            refill = (self.now - updated_at) * self.num_requests / self.duration
+            self.tokens = min(self.num_requests, tokens + refill)
+            if self.tokens < 1:
+                return self.throttle_failure()
+            # a full bucket after ``duration`` is the same as no entry
+            self.cache.set(self.key, (self.tokens - 1, self.now), self.duration)
+            return True
+        finally:
+            self.cache.delete(lock_key)
+
+    def wait(self):
+        return (1 - self.tokens) * self.duration / self.num_requests
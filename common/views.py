@@ -0,0 +1,44 @@
+import hmac
+from django.conf import settings
+from django.db import DatabaseError, connections
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .db.stats import database_stats
+
+
+class HasHealthCheckToken(permissions.BasePermission):
+    """
+    Grants access to requests carrying ``HEALTH_CHECK_TOKEN`` in the
+    ``X-Health-Check-Token`` header.
+    """
+
+    def has_permission(self, request, view):
+        token = getattr(settings, "HEALTH_CHECK_TOKEN", "")
+        sent = request.headers.get("X-Health-Check-Token", "")
+        return bool(token) and hmac.compare_digest(sent.encode(), token.encode())
+
+
+class DatabaseHealthView(APIView):
+    """
+    Runs a query on every database and reports its connection stats, 503
+    when one can't be reached. Errors are reported by class name only.
+    """
+    permission_classes = [permissions.IsAdminUser | HasHealthCheckToken]
+
+    def get(self, request):
+        databases = {}
+        for alias in connections:
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except DatabaseError as exc:
+                error = type(exc).__name__
+            else:
+                error = None
+            databases[alias] = {"ok": error is None, "error": error, **database_stats(alias)}
+        healthy = all(database["ok"] for database in databases.values())
+        return Response(
+            {"databases": databases},
+            status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
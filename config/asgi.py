@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The API views are sync DRF views, so under ASGI each request runs in a
+worker thread. There are no async variants of the read endpoints: DRF has
+no async dispatch, and Django's async ORM and cache methods still run the
+sync code in a thread, so they would add a second hop rather than remove
+one. For API throughput deploy config.wsgi behind a threaded or
+multi-process server; only RedirectMiddleware is async capable.
 """
 
 import os
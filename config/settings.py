@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django_currentuser.middleware.ThreadLocalUserMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'post.middleware.RedirectMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +38,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 #---------------------------------------------
+# Seconds between checks for redirect changes made by other processes
+REDIRECT_TABLE_CHECK_INTERVAL = int(os.getenv("REDIRECT_TABLE_CHECK_INTERVAL", 5))
+#---------------------------------------------
 ROOT_URLCONF = 'config.urls'
 #---------------------------------------------
 TEMPLATES = [
@@ -59,16 +63,72 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 #---------------------------------------------
 # Database
+# DB_ENGINE defaults to the postgresql backend, timing how long getting a
+# connection takes; django.db.backends.sqlite3 serves development and the
+# test suite.
+# DB_POOL_MAX_SIZE > 0 pools connections per process (psycopg 3 with
+# psycopg_pool, the way to go under ASGI); otherwise each thread keeps its
+# connection for DB_CONN_MAX_AGE seconds. Connections are health checked
+# before they are reused.
+DB_ENGINE = os.getenv("DB_ENGINE", "common.db.postgresql")
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 0))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql', 
+        'ENGINE': DB_ENGINE, 
         'NAME': os.getenv("DB_NAME"),
         'USER': os.getenv("DB_USER"),
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT"),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "true").strip().lower() in ("1", "true", "yes", "on"),
+        'OPTIONS': {},
+    }
+}
+if "postgresql" in DB_ENGINE:
+    DATABASES['default']['OPTIONS']['connect_timeout'] = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+if DB_POOL_MAX_SIZE:
+    from psycopg_pool import ConnectionPool
+    DATABASES['default']['OPTIONS']['pool'] = {
+        # checked on checkout whatever CONN_HEALTH_CHECKS says, Django only
+        # adds the check itself when that is on
+        'check': ConnectionPool.check_connection,
+        'min_size': min(int(os.getenv("DB_POOL_MIN_SIZE", 2)), DB_POOL_MAX_SIZE),
+        'max_size': DB_POOL_MAX_SIZE,
+        # seconds a request waits for a free connection before failing
+        'timeout': float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        'max_idle': float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+        'max_lifetime': float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+    }
+# Token monitoring sends in the X-Health-Check-Token header to read the
+# database health and pool stats; staff can read them without it. Empty
+# leaves them to staff only.
+HEALTH_CHECK_TOKEN = os.getenv("HEALTH_CHECK_TOKEN", "")
+# Text search configuration used for the post search vector
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "simple")
+#---------------------------------------------
+# Cache
+# Every worker has to see the same cache: the redirect table version, the
+# versioned response caches and the throttles are kept in it. LocMemCache
+# (CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache) is per
+# process and only fits development and the test suite.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'redis://127.0.0.1:6379/1'),
     }
 }
+# Seconds a rendered post detail response may be served from cache
+POST_DETAIL_CACHE_TIMEOUT = int(os.getenv("POST_DETAIL_CACHE_TIMEOUT", 300))
+#---------------------------------------------
+# Post view counting: seconds views are buffered in process before being
+# written (0 writes every view), and how trending scores decay. Scores are
+# recomputed by the refresh_trending_posts command, schedule it (e.g. cron
+# every 5 minutes)
+VIEW_COUNTER_FLUSH_INTERVAL = float(os.getenv("VIEW_COUNTER_FLUSH_INTERVAL", 10))
+TRENDING_BUCKET_SECONDS = int(os.getenv("TRENDING_BUCKET_SECONDS", 3600))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 24))
+TRENDING_WINDOW_DAYS = int(os.getenv("TRENDING_WINDOW_DAYS", 7))
 #---------------------------------------------
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -91,7 +151,22 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # proxies in front of the app that append to X-Forwarded-For; with 0
+    # throttles and logged addresses use REMOTE_ADDR and ignore the header
+    'NUM_PROXIES': int(os.getenv("NUM_PROXIES", 0)),
+    'DEFAULT_THROTTLE_RATES': {
+        # token buckets: capacity / time to refill it
+        'contact_ip': os.getenv("CONTACT_IP_RATE", '5/min'),
+        'contact_mobile': os.getenv("CONTACT_MOBILE_RATE", '3/hour'),
+    },
 }
+# Contact messages: seconds a repeated message is ignored, the queue the
+# background writer inserts from (size 0 inserts in the request), and the
+# seconds a request waits for its message to be committed
+CONTACT_DUPLICATE_WINDOW = int(os.getenv("CONTACT_DUPLICATE_WINDOW", 600))
+CONTACT_WRITE_TIMEOUT = float(os.getenv("CONTACT_WRITE_TIMEOUT", 5.0))
+CONTACT_QUEUE_SIZE = int(os.getenv("CONTACT_QUEUE_SIZE", 1000))
+CONTACT_WRITE_BATCH_SIZE = int(os.getenv("CONTACT_WRITE_BATCH_SIZE", 100))
 #---------------------------------------------
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -102,7 +177,24 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Processes process_image_derivatives uses to render responsive image
+# variants, 0 renders inline
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", 2))
 
+#---------------------------------------------
+# Public site URLs used in the sitemap and feeds
+SITE_NAME = os.getenv("SITE_NAME", "Blog")
+SITE_URL = os.getenv("SITE_URL", "http://localhost")
+SITEMAP_URL_PATTERNS = {
+    "posts": os.getenv("SITEMAP_POST_PATH", "/post/{slug}/"),
+    "categories": os.getenv("SITEMAP_CATEGORY_PATH", "/category/{slug}/"),
+    "tags": os.getenv("SITEMAP_TAG_PATH", "/tag/{slug}/"),
+}
+SITEMAP_ROOT = os.getenv("SITEMAP_ROOT", os.path.join(BASE_DIR, 'sitemaps'))
+# Seconds the sitemap page boundaries are reused before being recomputed
+SITEMAP_CACHE_TIMEOUT = int(os.getenv("SITEMAP_CACHE_TIMEOUT", 300))
+# Seconds a rendered feed may be served from cache
+FEED_CACHE_TIMEOUT = int(os.getenv("FEED_CACHE_TIMEOUT", 3600))
 #---------------------------------------------
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -5,6 +5,16 @@ from drf_spectacular.views import (
     SpectacularRedocView,
     SpectacularSwaggerView,
 )
+from common.views import DatabaseHealthView
+from post.feeds import (
+    CategoryPostsAtomFeed,
+    CategoryPostsFeed,
+    LatestPostsAtomFeed,
+    LatestPostsFeed,
+    TagPostsAtomFeed,
+    TagPostsFeed,
+)
+from post.views import SitemapSectionView, SitemapView
 
 urlpatterns = [
     path('adminpanel/', admin.site.urls),
@@ -12,4 +22,13 @@ urlpatterns = [
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/v1/post/', include('post.urls', namespace='post')),
+    path('health/db/', DatabaseHealthView.as_view(), name='database-health'),
+    path('sitemap.xml', SitemapView.as_view(), name='sitemap'),
+    path('sitemap-<str:section>-<int:page>.xml', SitemapSectionView.as_view(), name='sitemap-section'),
+    path('feeds/rss/', LatestPostsFeed(), name='feed-rss'),
+    path('feeds/atom/', LatestPostsAtomFeed(), name='feed-atom'),
+    path('feeds/rss/category/<str:slug>/', CategoryPostsFeed(), name='feed-category-rss'),
+    path('feeds/atom/category/<str:slug>/', CategoryPostsAtomFeed(), name='feed-category-atom'),
+    path('feeds/rss/tag/<str:slug>/', TagPostsFeed(), name='feed-tag-rss'),
+    path('feeds/atom/tag/<str:slug>/', TagPostsAtomFeed(), name='feed-tag-atom'),
 ]
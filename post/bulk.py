@@ -0,0 +1,406 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_currentuser.middleware import get_current_authenticated_user
+from common.cache import bump_versions_on_commit, dependency_key
+from common.slugs import allocate_slugs
+from .feeds import feed_version_key
+from .models import Category, Media, Post, Schema, Tag
+from .render import ARTIFACT_FIELDS, refresh_render_artifacts
+from .search import update_search_index
+from .serializers import PostCreateUpdateSerializer
+
+# plain columns carried as-is by export/import
+POST_FIELDS = (
+    "title",
+    "body",
+    "description",
+    "is_published",
+    "meta_title",
+    "meta_description",
+    "meta_keywords",
+    "canonical",
+    "index",
+    "follow",
+    "alt",
+)
+
+
+def set_post_tags(tag_ids_by_post, using="default"):
+    """
+    Replaces the tags of each post with two statements for the whole batch
+    instead of a ``tags.set()`` per post.
+    """
+    through = Post.tags.through
+    through.objects.using(using).filter(post_id__in=list(tag_ids_by_post)).delete()
+    through.objects.using(using).bulk_create(
+        [
+            through(post_id=post_id, tag_id=tag_id)
+            for post_id, tag_ids in tag_ids_by_post.items()
+            for tag_id in set(tag_ids)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def touch(posts):
+    """
+    What ``save()`` would set on update; ``bulk_update`` skips ``pre_save``.
+    """
+    now = timezone.now()
+    user = get_current_authenticated_user()
+    for post in posts:
+        post._updated_at = now
+        post._updated_by_id = user.pk if user else None
+
+
+def bump_post_versions(posts, using="default"):
+    """
+    Bulk writes skip model signals, so cached responses and feeds that
+    include these posts are invalidated here.
+    """
+    posts = list(posts)
+    keys = {feed_version_key("site")}
+    for post in posts:
+        keys.add(dependency_key(Post, post.pk))
+        if post.category_id:
+            keys.add(feed_version_key("category", post.category_id))
+    tag_ids = Post.tags.through.objects.using(using).filter(
+        post_id__in=[post.pk for post in posts]
+    ).values_list("tag_id", flat=True).distinct()
+    keys.update(feed_version_key("tag", pk) for pk in tag_ids)
+    bump_versions_on_commit(keys, using=using)
+
+
+def refresh_derived_data(posts, using="default"):
+    """
+    What ``Post.save`` would have done, run once the batch has committed:
+    the search index rows. Related posts are only marked pending by the
+    writers, their lists are scored after the import or by a worker.
+    """
+    update_search_index(posts, using=using)
+
+
+def export_record(post):
+    record = {"id": str(post.pk), "slug": post.slug}
+    record.update((name, getattr(post, name)) for name in POST_FIELDS)
+    record.update({
+        "created_at": post._created_at.isoformat(),
+        "updated_at": post._updated_at.isoformat(),
+        "category": (
+            {"slug": post.category.slug, "title": post.category.title}
+            if post.category else None
+        ),
+        "image": str(post.image_id) if post.image_id else None,
+        "tags": [{"slug": tag.slug, "title": tag.title} for tag in post.tags.all()],
+        "schema_items": [schema.content for schema in post.schema_items.all()],
+    })
+    return record
+
+
+class PostImporter:
+    """
+    Upserts exported post records by slug, one chunk at a time, with a fixed
+    number of queries per chunk whatever its size. A record whose slug
+    belongs to a soft-deleted post restores it.
+
+    Imported posts are only marked ``related_pending``; scoring them chunk
+    by chunk is quadratic, so callers run one ``rebuild_related_posts``
+    when the import is done.
+    """
+
+    def __init__(self, using="default"):
+        self.using = using
+        self.created = 0
+        self.updated = 0
+        self.restored = 0
+
+    def resolve_by_slug(self, model, items):
+        """
+        ``{slug: pk}`` for ``items`` (dicts with slug/title), creating the
+        missing rows in one ``bulk_create``.
+        """
+        items = {item["slug"]: item for item in items if item and item.get("slug")}
+        if not items:
+            return {}
+        manager = model.all_objects.using(self.using)
+        found = dict(manager.filter(slug__in=list(items)).values_list("slug", "pk"))
+        missing = [
+            model(slug=slug, title=item.get("title") or slug)
+            for slug, item in items.items() if slug not in found
+        ]
+        manager.bulk_create(missing)
+        found.update((obj.slug, obj.pk) for obj in missing)
+        return found
+
+    def import_chunk(self, records):
+        # a slug repeated inside the chunk keeps its last record
+        without_slug = [record for record in records if not record.get("slug")]
+        explicit_slugs = {record["slug"] for record in records if record.get("slug")}
+        for record, slug in zip(
+            without_slug,
+            allocate_slugs(
+                Post,
+                [record.get("title") for record in without_slug],
+                using=self.using,
+                reserved=explicit_slugs,
+            ),
+        ):
+            record["slug"] = slug
+        records = list({record["slug"]: record for record in records}.values())
+
+        with transaction.atomic(using=self.using):
+            categories = self.resolve_by_slug(Category, [record.get("category") for record in records])
+            tags = self.resolve_by_slug(Tag, [tag for record in records for tag in record.get("tags") or ()])
+            image_ids = {record["image"] for record in records if record.get("image")}
+            images = {
+                str(pk) for pk in
+                Media.all_objects.using(self.using).filter(pk__in=image_ids).values_list("pk", flat=True)
+            }
+            existing = {
+                slug: (pk, is_deleted)
+                for slug, pk, is_deleted in Post.all_objects.using(self.using)
+                .filter(slug__in=[record["slug"] for record in records])
+                .values_list("slug", "pk", "_is_deleted")
+            }
+
+            to_create, to_update, restored = [], [], 0
+            for record in records:
+                post = Post(slug=record["slug"])
+                for name in POST_FIELDS:
+                    if name in record:
+                        setattr(post, name, record[name])
+                category = record.get("category") or {}
+                post.category_id = categories.get(category.get("slug"))
+                post.image_id = record.get("image") if record.get("image") in images else None
+                created_at = parse_datetime(record.get("created_at") or "")
+                if created_at is not None:
+                    post._created_at = created_at
+                if record["slug"] in existing:
+                    post.pk, is_deleted = existing[record["slug"]]
+                    restored += is_deleted
+                    to_update.append(post)
+                else:
+                    to_create.append(post)
+
+            for post in to_create + to_update:
+                refresh_render_artifacts(post)
+                post.related_pending = True
+            manager = Post.all_objects.using(self.using)
+            manager.bulk_create(to_create)
+            touch(to_update)
+            manager.bulk_update(
+                to_update,
+                list(POST_FIELDS) + list(ARTIFACT_FIELDS) + [
+                    "category", "image", "_updated_at", "_updated_by", "_is_deleted", "_deleted_at",
+                    "related_pending",
+                ]
+            )
+
+            posts = to_create + to_update
+            pks = {post.slug: post.pk for post in posts}
+            set_post_tags(
+                {
+                    pks[record["slug"]]: [
+                        tags[tag["slug"]] for tag in record.get("tags") or () if tag.get("slug") in tags
+                    ]
+                    for record in records
+                },
+                using=self.using,
+            )
+            # detach rather than delete, as PostCreateUpdateSerializer.update does
+            Schema.all_objects.using(self.using).filter(
+                post_id__in=[post.pk for post in to_update]
+            ).update(post=None)
+            Schema.all_objects.using(self.using).bulk_create([
+                Schema(post_id=pks[record["slug"]], content=content)
+                for record in records
+                for content in record.get("schema_items") or ()
+            ])
+
+            bump_post_versions(posts, using=self.using)
+
+        refresh_derived_data(posts, using=self.using)
+        self.created += len(to_create)
+        self.updated += len(to_update) - restored
+        self.restored += restored
+        return len(posts)
+
+
+class PostBatchWriter:
+    """
+    Validates a list of ``PostCreateUpdateSerializer`` payloads together and
+    writes the valid ones in one transaction.
+
+    Items with an ``id`` are partial updates, the rest are creates. Related
+    PKs for the whole batch are loaded with one query per model, and writes
+    use bulk statements. Invalid items are reported by index and skipped,
+    they don't abort the batch. The search index is refreshed after the
+    commit; the posts are marked for the refresh_related_posts command.
+    """
+    max_items = 500
+    related_fields = {
+        "category": Category,
+        "image": Media,
+        "tags": Tag,
+        "schema_items": Schema,
+    }
+
+    def __init__(self, context=None, using="default"):
+        self.context = context or {}
+        self.using = using
+
+    def to_pk(self, model, value):
+        try:
+            return model._meta.pk.to_python(value)
+        except ValidationError:
+            return None
+
+    def related_lookups(self, items):
+        references = {model: set() for model in self.related_fields.values()}
+        for item in items:
+            for name, model in self.related_fields.items():
+                value = item.get(name)
+                values = value if isinstance(value, list) else [value]
+                references[model].update(
+                    pk for pk in (self.to_pk(model, value) for value in values if value) if pk
+                )
+        return {
+            model: model.objects.using(self.using).in_bulk(list(pks)) if pks else {}
+            for model, pks in references.items()
+        }
+
+    def validate(self, items):
+        """
+        Returns ``(valid, errors)``: ``valid`` holds ``(index, instance,
+        validated_data)``, ``errors`` maps index to error details.
+        """
+        errors = {}
+        objects = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[index] = {"non_field_errors": ["Expected an object."]}
+            else:
+                objects[index] = item
+
+        ids = {self.to_pk(Post, item["id"]) for item in objects.values() if item.get("id")}
+        instances = Post.objects.using(self.using).in_bulk([pk for pk in ids if pk])
+        slugs = [item["slug"] for item in objects.values() if item.get("slug")]
+        taken_slugs = dict(
+            Post.all_objects.using(self.using).filter(slug__in=slugs).values_list("slug", "pk")
+        )
+        context = dict(self.context, related_lookups=self.related_lookups(objects.values()))
+
+        valid = []
+        for index, item in objects.items():
+            instance = None
+            if item.get("id"):
+                instance = instances.get(self.to_pk(Post, item["id"]))
+                if instance is None:
+                    errors[index] = {"id": ["Post not found."]}
+                    continue
+            serializer = PostCreateUpdateSerializer(
+                instance,
+                data=item,
+                partial=instance is not None,
+                context=context
+            )
+            # uniqueness is checked against taken_slugs below, not per item
+            serializer.fields["slug"].validators = []
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            slug = serializer.validated_data.get("slug")
+            if slug:
+                owner = taken_slugs.get(slug)
+                if owner is not None and (instance is None or owner != instance.pk):
+                    errors[index] = {"slug": ["post with this slug already exists."]}
+                    continue
+                taken_slugs[slug] = instance.pk if instance else index
+            valid.append((index, instance, serializer.validated_data))
+        return valid, errors
+
+    def write(self, items):
+        """
+        Returns one result per item: ``status`` is ``created``, ``updated`` or
+        ``error``.
+        """
+        valid, errors = self.validate(items)
+        results = {
+            index: {"index": index, "status": "error", "errors": detail}
+            for index, detail in errors.items()
+        }
+
+        to_create, to_update, update_fields = [], [], set()
+        tags, schemas = {}, {}
+        written = []
+        for index, instance, validated_data in valid:
+            data = dict(validated_data)
+            item_tags = data.pop("tags", None)
+            item_schemas = data.pop("schema_items", None)
+            if instance is None:
+                post = Post(**data)
+                to_create.append(post)
+            else:
+                post = instance
+                for name, value in data.items():
+                    setattr(post, name, value)
+                update_fields.update(data)
+                to_update.append(post)
+            # same as PostCreateUpdateSerializer: an empty list leaves tags alone
+            if item_tags:
+                tags[index] = item_tags
+            if item_schemas is not None or instance is None:
+                schemas[index] = item_schemas or []
+            if refresh_render_artifacts(post) and instance is not None:
+                update_fields.update(ARTIFACT_FIELDS)
+            post.related_pending = True
+            written.append((index, post, instance is None))
+
+        with transaction.atomic(using=self.using):
+            manager = Post.all_objects.using(self.using)
+            without_slug = [post for post in to_create if not post.slug]
+            manager.bulk_create([post for post in to_create if post.slug])
+            for post, slug in zip(
+                without_slug,
+                allocate_slugs(Post, [post.title for post in without_slug], using=self.using),
+            ):
+                post.slug = slug
+            manager.bulk_create(without_slug)
+            if to_update:
+                touch(to_update)
+                manager.bulk_update(
+                    to_update,
+                    sorted(update_fields | {"_updated_at", "_updated_by", "related_pending"})
+                )
+
+            posts = {index: post for index, post, created in written}
+            if tags:
+                set_post_tags(
+                    {posts[index].pk: [tag.pk for tag in item_tags] for index, item_tags in tags.items()},
+                    using=self.using,
+                )
+            if schemas:
+                Schema.all_objects.using(self.using).filter(
+                    post_id__in=[posts[index].pk for index in schemas]
+                ).update(post=None)
+                attached = []
+                for index, item_schemas in schemas.items():
+                    for schema in item_schemas:
+                        schema.post_id = posts[index].pk
+                        attached.append(schema)
+                Schema.all_objects.using(self.using).bulk_update(attached, ["post"])
+
+            bump_post_versions(posts.values(), using=self.using)
+
+        refresh_derived_data(list(posts.values()), using=self.using)
+
+        for index, post, created in written:
+            results[index] = {
+                "index": index,
+                "status": "created" if created else "updated",
+                "id": str(post.pk),
+                "slug": post.slug,
+            }
+        return [results[index] for index in range(len(items))]
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from common.cache import VersionedCache, dependency_key
+from .models import Category, Media, Post, Schema, Tag
+
+post_detail_cache = VersionedCache(
+    "post-detail",
+    timeout=getattr(settings, "POST_DETAIL_CACHE_TIMEOUT", 300),
+)
+
+
+def post_dependency_keys(**lookup):
+    """
+    Version keys of every row ``DetailPostSerializer`` renders for the post
+    matching ``lookup`` (``slug=`` or ``id=``), from a few id-only queries.
+    """
+    post = get_object_or_404(Post.objects.only("pk", "category_id", "image_id"), **lookup)
+    keys = [dependency_key(Post, post.pk)]
+    if post.category_id:
+        keys.append(dependency_key(Category, post.category_id))
+    if post.image_id:
+        keys.append(dependency_key(Media, post.image_id))
+    keys.extend(dependency_key(Tag, pk) for pk in post.tags.values_list("pk", flat=True))
+    keys.extend(dependency_key(Schema, pk) for pk in post.schema_items.values_list("pk", flat=True))
+    keys.extend(
+        dependency_key(Post, pk)
+        for pk in post.related_links.values_list("related_id", flat=True)
+    )
+    return keys
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Redirect table versions, response cache versions and throttle buckets
+    only reach every worker through a shared cache.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f"The default cache ({backend}) is local to each process.",
+                hint=(
+                    "Set CACHE_BACKEND to a cache all workers share, e.g. "
+                    "django.core.cache.backends.redis.RedisCache."
+                ),
+                id="post.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,193 @@
+import atexit
+import hashlib
+import ipaddress
+import logging
+import queue
+import threading
+import unicodedata
+from concurrent.futures import Future
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from common.throttling import TokenBucketThrottle
+from .models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_FIELDS = ("mobile", "name", "company_name", "work_field")
+# tells the writer thread to stop
+STOP = object()
+
+
+def normalize_mobile(value):
+    """
+    The national number of a mobile: digits in any script, without the
+    ``+98``/``0098`` prefix or leading zeros, so every spelling of one
+    number shares its throttle and duplicate key.
+    """
+    if not isinstance(value, str):
+        return ""
+    digits = "".join(str(unicodedata.decimal(char)) for char in value if char.isdecimal())
+    for prefix in ("0098", "98"):
+        if digits.startswith(prefix) and len(digits) > 10:
+            digits = digits[len(prefix):]
+            break
+    return digits.lstrip("0")
+
+
+def client_ip(request, throttle):
+    """
+    The client address as ``throttle`` identifies it, honouring
+    ``NUM_PROXIES``, or ``None`` when that is not an IP address.
+    """
+    try:
+        return str(ipaddress.ip_address(throttle.get_ident(request)))
+    except ValueError:
+        return None
+
+
+class ContactIPThrottle(TokenBucketThrottle):
+    scope = "contact_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class ContactMobileThrottle(TokenBucketThrottle):
+    scope = "contact_mobile"
+
+    def get_cache_key(self, request, view):
+        mobile = normalize_mobile(request.data.get("mobile") if hasattr(request.data, "get") else None)
+        if not mobile:
+            # rejected by the serializer anyway
+            return None
+        ident = hashlib.sha256(mobile.encode("ascii")).hexdigest()
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+def message_key(data):
+    signature = "\x1f".join(
+        normalize_mobile(data.get(name)) if name == "mobile"
+        else " ".join(str(data.get(name) or "").split()).casefold()
+        for name in DUPLICATE_FIELDS
+    )
+    return "contact-message:" + hashlib.sha1(signature.encode("utf-8")).hexdigest()
+
+
+def claim_message(key, message_id):
+    """
+    Records ``message_id`` under ``key`` for ``CONTACT_DUPLICATE_WINDOW``
+    seconds. Returns ``None`` when the message is new, else the id of the
+    earlier message with the same content.
+    """
+    window = getattr(settings, "CONTACT_DUPLICATE_WINDOW", 600)
+    for attempt in range(2):
+        if cache.add(key, str(message_id), window):
+            return None
+        earlier = cache.get(key)
+        if earlier is not None:
+            return earlier
+    # expired between the two calls twice over, take it as new
+    cache.set(key, str(message_id), window)
+    return None
+
+
+class ContactMessageQueue:
+    """
+    Bounded queue of unsaved contact messages that a writer thread inserts
+    with ``bulk_create``. A batch is whatever is waiting, up to
+    ``CONTACT_WRITE_BATCH_SIZE`` rows, and is written as soon as the queue
+    is drained: messages arriving during a write make up the next batch,
+    none waits for a batch to fill. ``put`` returns a future
+    resolved once the message is committed, or failed with the database
+    error; it raises ``queue.Full`` once ``CONTACT_QUEUE_SIZE`` messages are
+    waiting. With a size of 0 messages are inserted right away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+
+    @property
+    def maxsize(self):
+        return getattr(settings, "CONTACT_QUEUE_SIZE", 1000)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, "CONTACT_WRITE_BATCH_SIZE", 100)
+
+    def _writer(self):
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=self.maxsize)
+                self._thread = threading.Thread(
+                    target=self.run,
+                    args=(self._queue,),
+                    name="contact-messages",
+                    daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.shutdown)
+        return self._queue
+
+    def put(self, message):
+        future = Future()
+        if self.maxsize <= 0:
+            self.write([(message, future)])
+        else:
+            self._writer().put_nowait((message, future))
+        return future
+
+    def run(self, pending):
+        stopping = False
+        while not stopping:
+            item = pending.get()
+            if item is STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self.write(batch)
+            finally:
+                close_old_connections()
+
+    def write(self, batch):
+        # requests that gave up waiting cancelled their future, skip those
+        batch = [(message, future) for message, future in batch if future.set_running_or_notify_cancel()]
+        try:
+            ContactMessage.objects.bulk_create(
+                [message for message, future in batch],
+                batch_size=self.batch_size
+            )
+        except Exception as exc:
+            # every waiting request gets an answer, whatever went wrong
+            logger.exception("Dropped %d contact messages.", len(batch))
+            for message, future in batch:
+                future.set_exception(exc)
+        else:
+            for message, future in batch:
+                future.set_result(message)
+
+    def shutdown(self, timeout=5):
+        with self._lock:
+            thread, pending = self._thread, self._queue
+            self._thread = self._queue = None
+        if thread is None:
+            return
+        try:
+            pending.put(STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+
+contact_queue = ContactMessageQueue()
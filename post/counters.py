@@ -0,0 +1,161 @@
+import atexit
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Post, PostViewBucket, PostViewStats
+
+# rows per UPDATE ... CASE statement
+WRITE_BATCH_SIZE = 500
+
+
+def bucket_start(when, size):
+    seconds = int(size.total_seconds())
+    return datetime.fromtimestamp(int(when.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def increment(queryset, key, field, deltas):
+    """
+    Adds ``deltas`` (``{key value: amount}``) to ``field`` of the matching
+    rows of ``queryset`` in one UPDATE per batch.
+    """
+    deltas = list(deltas.items())
+    for start in range(0, len(deltas), WRITE_BATCH_SIZE):
+        batch = dict(deltas[start:start + WRITE_BATCH_SIZE])
+        rows = queryset.filter(**{f"{key}__in": list(batch)})
+        # lock in a fixed order so concurrent flushes can't deadlock
+        list(rows.select_for_update().order_by(key).values_list(key, flat=True))
+        rows.update(**{field: F(field) + Case(
+            *[When(**{key: value}, then=Value(amount)) for value, amount in batch.items()],
+            default=Value(0),
+        )})
+
+
+def write_views(deltas, using="default"):
+    """
+    Adds ``{(post id, bucket): views}`` to the post totals and buckets.
+    Views of posts removed in the meantime are dropped.
+    """
+    totals = Counter()
+    buckets = defaultdict(dict)
+    for (post_id, bucket), views in deltas.items():
+        totals[post_id] += views
+        buckets[bucket][post_id] = views
+    live = set(
+        Post.all_objects.using(using).filter(pk__in=list(totals)).values_list("pk", flat=True)
+    )
+    if not live:
+        return
+    with transaction.atomic(using=using):
+        stats = PostViewStats.objects.using(using)
+        stats.bulk_create([PostViewStats(post_id=pk) for pk in live], ignore_conflicts=True)
+        increment(stats, "post_id", "view_count", {pk: totals[pk] for pk in live})
+        for bucket, views in buckets.items():
+            views = {pk: count for pk, count in views.items() if pk in live}
+            rows = PostViewBucket.objects.using(using)
+            rows.bulk_create(
+                [PostViewBucket(post_id=pk, bucket=bucket) for pk in views],
+                ignore_conflicts=True,
+            )
+            increment(rows.filter(bucket=bucket), "post_id", "views", views)
+
+
+def refresh_trending_scores(now=None, using="default"):
+    """
+    Recomputes every trending score from the buckets of the last
+    ``TRENDING_WINDOW_DAYS``, each bucket's views halving in weight every
+    ``TRENDING_HALF_LIFE_HOURS``, and drops older buckets. The scores are
+    summed by one UPDATE in the database; run it from the scheduled
+    ``refresh_trending_posts`` command. Returns the number of trending posts.
+    """
+    now = now or timezone.now()
+    half_life = getattr(settings, "TRENDING_HALF_LIFE_HOURS", 24) * 3600
+    start = now - timedelta(days=getattr(settings, "TRENDING_WINDOW_DAYS", 7))
+    buckets = PostViewBucket.objects.using(using).filter(bucket__gte=start)
+    # one weight per bucket start, there are at most window / bucket size
+    weight = Case(
+        *[
+            When(bucket=bucket, then=Value(0.5 ** (max((now - bucket).total_seconds(), 0) / half_life)))
+            for bucket in buckets.values_list("bucket", flat=True).distinct()
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    scores = (
+        buckets.filter(post_id=OuterRef("post_id"))
+        .values("post_id")
+        .annotate(score=Sum(F("views") * weight, output_field=FloatField()))
+        .values("score")
+    )
+    stats = PostViewStats.objects.using(using)
+    with transaction.atomic(using=using):
+        stats.filter(Q(trending_score__gt=0) | Q(post_id__in=buckets.values("post_id"))).update(
+            trending_score=Coalesce(Subquery(scores, output_field=FloatField()), Value(0.0))
+        )
+        PostViewBucket.objects.using(using).filter(bucket__lt=start).delete()
+    return stats.filter(trending_score__gt=0).count()
+
+
+class ViewCounter:
+    """
+    Counts post views in process: a hit is a dict increment, and a timer
+    thread writes the summed deltas every ``VIEW_COUNTER_FLUSH_INTERVAL``
+    seconds. With an interval of 0 every view is written right away.
+    Trending scores are left to the ``refresh_trending_posts`` command.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._timer = None
+        atexit.register(self.flush)
+
+    @property
+    def interval(self):
+        return getattr(settings, "VIEW_COUNTER_FLUSH_INTERVAL", 10)
+
+    @property
+    def bucket_size(self):
+        return timedelta(seconds=getattr(settings, "TRENDING_BUCKET_SECONDS", 3600))
+
+    def record(self, post_id, when=None):
+        key = (post_id, bucket_start(when or timezone.now(), self.bucket_size))
+        with self._lock:
+            self._pending[key] += 1
+            if self.interval > 0 and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.run_in_thread)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.interval <= 0:
+            self.flush()
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._timer = None
+        return pending
+
+    def flush(self):
+        pending = self.take()
+        if not pending:
+            return
+        try:
+            write_views(pending)
+        except DatabaseError:
+            # keep the views for the next flush
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+    def run_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from common.cache import VersionedCache, dependency_key, version_key
+from common.conditional import content_etag, not_modified_response, set_validators
+from .models import Category, Post, Tag
+from .sitemaps import post_location, site_url
+
+FEED_ITEMS = 20
+
+feed_cache = VersionedCache(
+    "feed",
+    timeout=getattr(settings, "FEED_CACHE_TIMEOUT", 3600),
+)
+
+
+def feed_version_key(kind, pk=None):
+    """
+    Version of the post list behind a feed; bumped when a post enters, leaves
+    or changes in it.
+    """
+    if pk is None:
+        return version_key("feed", kind)
+    return version_key("feed", kind, pk)
+
+
+class LatestPostsFeed(Feed):
+    """
+    Latest published posts. The rendered document is cached as bytes and
+    stays valid until the feed's version or one of its posts' versions is
+    bumped, so steady-state polling is served from the cache alone.
+    """
+    feed_type = Rss201rev2Feed
+    kind = "site"
+    item_guid_is_permalink = False
+
+    def __call__(self, request, *args, **kwargs):
+        key = ":".join((self.feed_type.__name__, self.kind) + tuple(kwargs.values()))
+        entry = feed_cache.get_or_build(
+            key,
+            lambda: self.dependency_keys(self.get_object(request, *args, **kwargs)),
+            lambda: self.build_entry(request, *args, **kwargs)
+        )
+        response = not_modified_response(request, entry["etag"])
+        if response is None:
+            response = HttpResponse(entry["content"], content_type=entry["content_type"])
+            set_validators(response, entry["etag"])
+        return response
+
+    def build_entry(self, request, *args, **kwargs):
+        obj = self.get_object(request, *args, **kwargs)
+        feedgen = self.get_feed(obj, request)
+        content = feedgen.writeString("utf-8").encode("utf-8")
+        return {
+            "content": content,
+            "content_type": feedgen.content_type,
+            "etag": content_etag(content),
+        }
+
+    def dependency_keys(self, obj):
+        keys = [feed_version_key(self.kind)]
+        items = self.get_queryset(obj).values_list("pk", "category_id")[:FEED_ITEMS]
+        for pk, category_id in items:
+            keys.append(dependency_key(Post, pk))
+            if category_id:
+                keys.append(dependency_key(Category, category_id))
+        return keys
+
+    def get_queryset(self, obj):
+        return Post.objects.filter(is_published=True).order_by("-_created_at")
+
+    def items(self, obj):
+        return self.get_queryset(obj).select_related("category")[:FEED_ITEMS]
+
+    def title(self, obj):
+        return settings.SITE_NAME
+
+    def link(self, obj):
+        return site_url("/")
+
+    def description(self, obj):
+        return settings.SITE_NAME
+
+    def item_title(self, item):
+        return item.title or ""
+
+    def item_description(self, item):
+        return item.description or item.meta_description or item.excerpt
+
+    def item_link(self, item):
+        return post_location(item.slug, item.canonical)
+
+    def item_guid(self, item):
+        return str(item.pk)
+
+    def item_pubdate(self, item):
+        return item._created_at
+
+    def item_updateddate(self, item):
+        return item._updated_at
+
+    def item_categories(self, item):
+        return [item.category.title] if item.category else []
+
+
+class CategoryPostsFeed(LatestPostsFeed):
+    kind = "category"
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Category, slug=slug)
+
+    def dependency_keys(self, obj):
+        keys = super().dependency_keys(obj)
+        keys[0] = feed_version_key(self.kind, obj.pk)
+        keys.append(dependency_key(Category, obj.pk))
+        return keys
+
+    def get_queryset(self, obj):
+        return super().get_queryset(obj).filter(category=obj)
+
+    def title(self, obj):
+        return f"{settings.SITE_NAME} - {obj.title}"
+
+    def link(self, obj):
+        return site_url(settings.SITEMAP_URL_PATTERNS["categories"].format(slug=obj.slug))
+
+
+class TagPostsFeed(LatestPostsFeed):
+    kind = "tag"
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Tag, slug=slug)
+
+    def dependency_keys(self, obj):
+        keys = super().dependency_keys(obj)
+        keys[0] = feed_version_key(self.kind, obj.pk)
+        keys.append(dependency_key(Tag, obj.pk))
+        return keys
+
+    def get_queryset(self, obj):
+        return super().get_queryset(obj).filter(tags=obj)
+
+    def title(self, obj):
+        return f"{settings.SITE_NAME} - {obj.title}"
+
+    def link(self, obj):
+        return site_url(settings.SITEMAP_URL_PATTERNS["tags"].format(slug=obj.slug))
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class CategoryPostsAtomFeed(CategoryPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = CategoryPostsFeed.description
+
+
+class TagPostsAtomFeed(TagPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = TagPostsFeed.description
@@ -0,0 +1,99 @@
+from uuid import UUID
+import django_filters
+from django.db.models import Exists, OuterRef, Q
+from rest_framework.filters import SearchFilter
+from .models import Post, Tag
+from .search import get_search_backend
+
+
+class PostSearchFilter(SearchFilter):
+    """
+    Full-text search over the post search index on the usual ``search``
+    param, ranked best first unless the client asked for an ordering. Falls
+    back to the ``search_fields`` lookups on databases without a backend.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        backend = get_search_backend(queryset.db)
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+        queryset = backend.search(queryset, terms)
+        if "ordering" not in request.query_params:
+            queryset = queryset.order_by("-search_rank", "-_created_at")
+        return queryset
+
+
+def parse_tag_tokens(value):
+    """
+    Splits a comma separated ``tags`` value into tag ids and slugs.
+    """
+    ids, slugs = set(), set()
+    for token in value.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            ids.add(UUID(token))
+        except ValueError:
+            slugs.add(token)
+    return ids, slugs
+
+
+def tagged(tag_ids):
+    """
+    ``EXISTS`` over the post/tag table for any of ``tag_ids``, served by its
+    unique (post_id, tag_id) index without joining rows into the result.
+    """
+    return Exists(
+        Post.tags.through.objects.filter(post_id=OuterRef("pk"), tag_id__in=tag_ids)
+    )
+
+
+class PostFilter(django_filters.FilterSet):
+    """
+    ``tags`` takes comma separated tag ids or slugs; ``tags_match=all``
+    keeps posts carrying every one of them, the default ``any`` posts
+    carrying at least one. Filters with ``EXISTS`` so a post matching
+    several tags is still a single row and counts stay right.
+    """
+
+    MATCH_ANY = "any"
+    MATCH_ALL = "all"
+
+    tags = django_filters.CharFilter(method="filter_tags")
+    tags_match = django_filters.ChoiceFilter(
+        choices=((MATCH_ANY, MATCH_ANY), (MATCH_ALL, MATCH_ALL)),
+        method="filter_nothing",
+    )
+    tags__title = django_filters.CharFilter(method="filter_tag_title")
+
+    class Meta:
+        model = Post
+        fields = ["category__slug", "title"]
+
+    def filter_nothing(self, queryset, name, value):
+        # read by filter_tags
+        return queryset
+
+    def filter_tags(self, queryset, name, value):
+        ids, slugs = parse_tag_tokens(value)
+        if not ids and not slugs:
+            return queryset
+        tags = dict(
+            Tag.objects.filter(Q(id__in=ids) | Q(slug__in=slugs)).values_list("id", "slug")
+        )
+        if self.form.cleaned_data.get("tags_match") != self.MATCH_ALL:
+            return queryset.filter(tagged(list(tags)))
+        # every token has to resolve to a live tag, then one EXISTS per tag
+        found = set(tags) | set(tags.values())
+        if not ids <= found or not slugs <= found:
+            return queryset.none()
+        for tag_id in tags:
+            queryset = queryset.filter(tagged([tag_id]))
+        return queryset
+
+    def filter_tag_title(self, queryset, name, value):
+        return queryset.filter(tagged(Tag.objects.filter(title=value).values("id")))
@@ -0,0 +1,321 @@
+import atexit
+import base64
+import hashlib
+import io
+import json
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import lru_cache, partial
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+from common.cache import bump_versions_on_commit, dependency_key
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_ROOT = "derivatives"
+IMAGE_FIELDS = ("image", "meta_og_image")
+# columns on Media describing ``image``, as they are without one
+EMPTY_METADATA = {
+    "width": None,
+    "height": None,
+    "size": None,
+    "mime_type": "",
+    "content_hash": None,
+    "placeholder": "",
+}
+# (name, width, height); a height means a center crop to exactly that box
+WIDTH_VARIANTS = tuple((f"{width}w", width, None) for width in (320, 640, 1024, 1600))
+OG_VARIANT = ("og", 1200, 630)
+VARIANTS = {
+    "image": WIDTH_VARIANTS + (OG_VARIANT,),
+    "meta_og_image": (OG_VARIANT,),
+}
+PLACEHOLDER_WIDTH = 16
+FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+
+def placeholder(image):
+    """
+    A tiny blurred WebP data URI to show while the real image loads.
+    """
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    thumbnail = image.convert("RGB").resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, "WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def render_variants(content, variants):
+    """
+    Decodes, resizes and encodes one image. Runs in the process pool, so it
+    only deals with bytes and touches neither Django nor storage.
+    """
+    source = Image.open(io.BytesIO(content))
+    mime_type = Image.MIME.get(source.format, "")
+    source = ImageOps.exif_transpose(source)
+    meta = {
+        "width": source.width,
+        "height": source.height,
+        "mime_type": mime_type,
+        "placeholder": placeholder(source),
+    }
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+
+    rendered = {}
+    full_size = False
+    for name, width, height in variants:
+        if height is not None:
+            image = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        elif source.width > width:
+            image = source.resize(
+                (width, max(1, round(source.height * width / source.width))),
+                Image.LANCZOS
+            )
+        elif not full_size:
+            # never upscale; one variant at the original size covers the rest
+            image = source
+            full_size = True
+        else:
+            continue
+        outputs = {"width": image.width, "height": image.height}
+        for extension, image_format, options in FORMATS:
+            frame = image.convert("RGB") if image_format == "JPEG" else image
+            buffer = io.BytesIO()
+            frame.save(buffer, image_format, **options)
+            outputs[extension] = buffer.getvalue()
+        rendered[name] = outputs
+    return {"meta": meta, "variants": rendered}
+
+
+def derivative_dir(digest):
+    return f"{DERIVATIVES_ROOT}/{digest[:2]}/{digest}"
+
+
+def load_manifest(digest):
+    path = f"{derivative_dir(digest)}/manifest.json"
+    if not default_storage.exists(path):
+        return None
+    with default_storage.open(path, "rb") as handle:
+        manifest = json.loads(handle.read())
+    # manifests written before metadata was recorded are rendered again
+    return manifest if "meta" in manifest else None
+
+
+def save_variants(digest, rendered):
+    """
+    Writes rendered variants under the content hash and returns the manifest
+    of storage paths; the manifest is written last so a partial run is redone.
+    """
+    directory = derivative_dir(digest)
+    manifest = {"meta": rendered["meta"], "variants": {}}
+    for name, outputs in rendered["variants"].items():
+        entry = {"width": outputs["width"], "height": outputs["height"]}
+        for extension, image_format, options in FORMATS:
+            path = f"{directory}/{name}.{extension}"
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            entry[extension] = default_storage.save(path, ContentFile(outputs[extension]))
+        manifest["variants"][name] = entry
+    default_storage.save(
+        f"{directory}/manifest.json",
+        ContentFile(json.dumps(manifest).encode("utf-8"))
+    )
+    return manifest
+
+
+def log_failure(media_id, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(
+            "Image derivatives for media %s failed.", media_id,
+            exc_info=future.exception()
+        )
+
+
+class DerivativePipeline:
+    """
+    Builds image derivatives for media rows marked ``derivatives_pending``.
+    Coordinator threads read the upload and check for existing derivatives
+    of the same content; the CPU work goes to a process pool. Only the
+    management commands create one, web workers just mark the rows. With
+    ``workers = 0`` everything runs inline.
+    """
+
+    def __init__(self, workers=None):
+        self._lock = threading.Lock()
+        self._coordinator = None
+        self._pool = None
+        if workers is None:
+            workers = getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2)
+        self.workers = workers
+
+    def _executors(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._coordinator = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="image-derivatives"
+                )
+                atexit.register(self.shutdown)
+        return self._coordinator, self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._coordinator.shutdown(wait=True)
+                self._pool.shutdown(wait=True)
+                self._coordinator = self._pool = None
+
+    def schedule(self, media_id, force=False):
+        """
+        Queues one media row. Returns a future, or the result when running
+        inline.
+        """
+        if self.workers <= 0:
+            return self.process(media_id, render=render_variants, force=force)
+        coordinator, pool = self._executors()
+        future = coordinator.submit(self.run_in_thread, media_id, pool, force)
+        future.add_done_callback(partial(log_failure, media_id))
+        return future
+
+    def run(self, media_ids, force=False):
+        """
+        Processes ``media_ids`` and waits for all of them. Returns
+        ``{media_id: exception}`` for the ones that failed.
+        """
+        failures = {}
+        pending = {}
+        for media_id in media_ids:
+            try:
+                result = self.schedule(media_id, force=force)
+            except Exception as exc:
+                logger.exception("Image derivatives for media %s failed.", media_id)
+                failures[media_id] = exc
+                continue
+            if isinstance(result, Future):
+                pending[result] = media_id
+        wait(pending)
+        for future, media_id in pending.items():
+            if future.exception() is not None:
+                failures[media_id] = future.exception()
+        return failures
+
+    def run_in_thread(self, media_id, pool, force=False):
+        try:
+            return self.process(
+                media_id,
+                render=lambda content, variants: pool.submit(render_variants, content, variants).result(),
+                force=force
+            )
+        finally:
+            close_old_connections()
+
+    def process(self, media_id, render, force=False):
+        from .models import Media, Post
+        media = Media.all_objects.filter(pk=media_id).first()
+        if media is None:
+            return None
+        derivatives = dict(media.derivatives or {})
+        changes = {}
+        for field in IMAGE_FIELDS:
+            file = getattr(media, field)
+            if not file:
+                derivatives.pop(field, None)
+                if field == "image":
+                    changes.update(EMPTY_METADATA)
+                continue
+            if not force and derivatives.get(field, {}).get("name") == file.name:
+                continue
+            with file.open("rb") as handle:
+                content = handle.read()
+            digest = hashlib.sha256(content).hexdigest()
+            manifest = load_manifest(digest)
+            if manifest is None:
+                manifest = save_variants(digest, render(content, VARIANTS[field]))
+            derivatives[field] = {
+                "name": file.name,
+                "hash": digest,
+                "variants": manifest["variants"],
+            }
+            if field == "image":
+                changes.update(manifest["meta"], size=len(content), content_hash=digest)
+        # update() rather than save(), no post_save loop; a file replaced in
+        # the meantime matches no row and stays pending for the next run
+        updated = Media.all_objects.filter(
+            pk=media_id,
+            **{field: getattr(media, field).name for field in IMAGE_FIELDS}
+        ).update(
+            derivatives=derivatives,
+            derivatives_pending=False,
+            _updated_at=timezone.now(),
+            **changes
+        )
+        if updated:
+            keys = [dependency_key(Media, media_id)]
+            keys.extend(
+                dependency_key(Post, pk)
+                for pk in Post.all_objects.filter(image_id=media_id).values_list("pk", flat=True)
+            )
+            bump_versions_on_commit(keys)
+        return derivatives
+
+
+def needs_derivatives(media):
+    derivatives = media.derivatives or {}
+    for field in IMAGE_FIELDS:
+        file = getattr(media, field)
+        current = derivatives.get(field, {}).get("name")
+        if (file.name if file else None) != current:
+            return True
+    return False
+
+
+@lru_cache(maxsize=16384)
+def derivative_url(path):
+    # paths are content addressed, the URL of one never changes
+    return default_storage.url(path)
+
+
+def build_srcset(derivatives):
+    """
+    ``{"webp": "url 320w, ...", "jpeg": ...}`` for the main image, from
+    ``Media.derivatives``.
+    """
+    variants = (derivatives or {}).get("image", {}).get("variants", {})
+    result = {}
+    for extension, image_format, options in FORMATS:
+        candidates = sorted(
+            (entry["width"], entry[extension])
+            for name, entry in variants.items()
+            if name != OG_VARIANT[0] and extension in entry
+        )
+        if candidates:
+            result[extension] = ", ".join(
+                f"{derivative_url(path)} {width}w" for width, path in candidates
+            )
+    return result
+
+
+def build_og_variants(derivatives):
+    """
+    URLs of the 1200x630 crop, from ``meta_og_image`` when there is one.
+    """
+    derivatives = derivatives or {}
+    for field in ("meta_og_image", "image"):
+        entry = derivatives.get(field, {}).get("variants", {}).get(OG_VARIANT[0])
+        if entry:
+            return {
+                extension: derivative_url(entry[extension])
+                for extension, image_format, options in FORMATS
+                if extension in entry
+            }
+    return {}
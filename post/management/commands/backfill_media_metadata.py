@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from post.images import DerivativePipeline
+from post.models import Media
+
+
+class Command(BaseCommand):
+    help = (
+        "Record dimensions, size, MIME type, content hash and placeholder for "
+        "media uploaded before they were stored, rendering derivatives on the way."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Rendering processes, IMAGE_DERIVATIVE_WORKERS by default."
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Reprocess every media row, not only the ones missing metadata."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        queryset = Media.all_objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            queryset = queryset.filter(content_hash__isnull=True)
+
+        pipeline = DerivativePipeline(workers=options["workers"])
+        total = failed = 0
+        last_pk = None
+        try:
+            while True:
+                # keyset over ids, rows updated by a batch do not shift the next one
+                batch = queryset.order_by("pk")
+                if last_pk is not None:
+                    batch = batch.filter(pk__gt=last_pk)
+                ids = list(batch.values_list("pk", flat=True)[:batch_size])
+                if not ids:
+                    break
+                last_pk = ids[-1]
+
+                failures = pipeline.run(ids, force=True)
+                for pk, exc in failures.items():
+                    self.stderr.write(f"Media {pk}: {exc}")
+                failed += len(failures)
+                total += len(ids)
+                self.stdout.write(f"Processed {total} media.")
+        finally:
+            pipeline.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total - failed} media, {failed} failed."))
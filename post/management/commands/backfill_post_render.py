@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from post.bulk import bump_post_versions
+from post.models import Post
+from post.render import ARTIFACT_FIELDS, refresh_render_artifacts
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the sanitized HTML, excerpt, reading time and table of contents "
+        "of posts whose body changed since they were last rendered."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Render every post, e.g. after changing the renderer."
+        )
+
+    def write_batch(self, manager, batch, using):
+        # bulk_update skips auto_now, set it so clients and caches see the change
+        now = timezone.now()
+        for post in batch:
+            post._updated_at = now
+        manager.bulk_update(batch, [*ARTIFACT_FIELDS, "_updated_at"])
+        bump_post_versions(batch, using=using)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        batch_size = options["batch_size"]
+        force = options["force"]
+        manager = Post.all_objects.using(using)
+        queryset = manager.only("id", "body", "body_hash", "category_id")
+
+        total = rendered = 0
+        batch = []
+        for post in queryset.iterator(chunk_size=batch_size):
+            total += 1
+            if refresh_render_artifacts(post, force=force):
+                batch.append(post)
+            if len(batch) >= batch_size:
+                self.write_batch(manager, batch, using)
+                rendered += len(batch)
+                batch = []
+        if batch:
+            self.write_batch(manager, batch, using)
+            rendered += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} of {total} posts."))
@@ -0,0 +1,41 @@
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from post.bulk import export_record
+from post.models import Post, Schema, Tag
+
+
+class Command(BaseCommand):
+    help = "Stream all posts to a JSONL file, one post per line."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="-", help="File path, '-' for stdout.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        queryset = (
+            Post.objects.using(options["database"])
+            .select_related("category")
+            .prefetch_related(
+                Prefetch("tags", queryset=Tag.all_objects.only("id", "slug", "title")),
+                Prefetch("schema_items", queryset=Schema.all_objects.only("id", "post_id", "content")),
+            )
+            .order_by("_created_at", "id")
+        )
+        output = options["output"]
+        handle = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+        started = time.monotonic()
+        total = 0
+        try:
+            for post in queryset.iterator(chunk_size=options["chunk_size"]):
+                handle.write(json.dumps(export_record(post), ensure_ascii=False))
+                handle.write("\n")
+                total += 1
+        finally:
+            if handle is not sys.stdout:
+                handle.close()
+        elapsed = time.monotonic() - started
+        self.stderr.write(f"Exported {total} posts in {elapsed:.1f}s ({total / max(elapsed, 1e-6):.0f} posts/s).")
@@ -0,0 +1,49 @@
+import gzip
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from post.sitemaps import (
+    SITEMAP_MAX_URLS,
+    render_index,
+    render_urlset,
+    sitemap_filename,
+    sitemap_pages
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Write gzipped sitemap files and a sitemap index to SITEMAP_ROOT so "
+        "the web server can serve them statically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.SITEMAP_ROOT)
+        parser.add_argument("--max-urls", type=int, default=SITEMAP_MAX_URLS)
+
+    def write(self, path, chunks):
+        # write next to the target and swap in, readers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        max_urls = options["max_urls"]
+        os.makedirs(output, exist_ok=True)
+
+        pages = sitemap_pages(max_urls, refresh=True)
+        for section, page in pages:
+            filename = sitemap_filename(section, page, ".xml.gz")
+            self.write(
+                os.path.join(output, filename),
+                render_urlset(section.urls(page, max_urls))
+            )
+            self.stdout.write(f"Wrote {filename}")
+        self.write(
+            os.path.join(output, "sitemap.xml.gz"),
+            render_index(pages, ".xml.gz")
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote sitemap index with {len(pages)} files."))
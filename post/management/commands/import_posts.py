@@ -0,0 +1,62 @@
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from post.bulk import PostImporter
+from post.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Import posts from a JSONL file written by export_posts, upserting by "
+        "slug in chunks of bulk statements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="File path, '-' for stdin.")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--database", default="default")
+
+    def report(self, importer, started, final=False):
+        elapsed = time.monotonic() - started
+        total = importer.created + importer.updated + importer.restored
+        message = (
+            f"{total} posts ({importer.created} created, {importer.updated} updated, "
+            f"{importer.restored} restored) "
+            f"in {elapsed:.1f}s, {total / max(elapsed, 1e-6):.0f} posts/s"
+        )
+        if final:
+            self.stdout.write(self.style.SUCCESS(f"Imported {message}."))
+        else:
+            self.stderr.write(message)
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        chunk_size = options["chunk_size"]
+        importer = PostImporter(using=options["database"])
+        handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        started = time.monotonic()
+        chunk = []
+        try:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append(json.loads(line))
+                except ValueError as exc:
+                    raise CommandError(f"Line {line_number}: {exc}")
+                if len(chunk) >= chunk_size:
+                    importer.import_chunk(chunk)
+                    chunk = []
+                    self.report(importer, started)
+            if chunk:
+                importer.import_chunk(chunk)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+        self.report(importer, started, final=True)
+        started = time.monotonic()
+        changed = rebuild_related_posts(using=options["database"])
+        self.stdout.write(
+            f"Updated related posts of {changed} posts in {time.monotonic() - started:.1f}s."
+        )
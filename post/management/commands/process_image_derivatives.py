@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import BaseCommand
+from post.images import DerivativePipeline
+from post.models import Media
+
+
+class Command(BaseCommand):
+    help = (
+        "Render derivatives for media whose files changed. Web workers only "
+        "mark the rows, run this from a worker or scheduler; --watch keeps "
+        "polling for new uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Rendering processes, IMAGE_DERIVATIVE_WORKERS by default."
+        )
+        parser.add_argument("--watch", action="store_true")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds between polls with --watch."
+        )
+
+    def process_pending(self, pipeline, batch_size):
+        processed = failed = 0
+        last_pk = None
+        while True:
+            # rows that fail stay pending, the keyset moves past them
+            batch = Media.all_objects.filter(derivatives_pending=True).order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            ids = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return processed, failed
+            last_pk = ids[-1]
+            failures = pipeline.run(ids)
+            for pk, exc in failures.items():
+                self.stderr.write(f"Media {pk}: {exc}")
+            processed += len(ids) - len(failures)
+            failed += len(failures)
+
+    def handle(self, *args, **options):
+        pipeline = DerivativePipeline(workers=options["workers"])
+        try:
+            while True:
+                processed, failed = self.process_pending(pipeline, options["batch_size"])
+                if processed or failed or not options["watch"]:
+                    self.stdout.write(f"Processed {processed} media, {failed} failed.")
+                if not options["watch"]:
+                    break
+                time.sleep(options["interval"])
+        finally:
+            pipeline.shutdown()
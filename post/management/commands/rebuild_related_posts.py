@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from post.related import rebuild_related_posts, sparse
+
+
+class Command(BaseCommand):
+    help = "Recompute the related posts of every live post."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        if sparse is None:
+            self.stdout.write("NumPy/SciPy are not installed, scoring in Python.")
+        changed = rebuild_related_posts(
+            batch_size=options["batch_size"],
+            using=options["database"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Updated related posts of {changed} posts."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from post.models import Post
+from post.search import INDEXED_FIELDS, get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for all posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        batch_size = options["batch_size"]
+        backend = get_search_backend(using)
+        if backend is None:
+            self.stdout.write("No full-text search backend for this database.")
+            return
+        backend.setup()
+
+        queryset = Post.all_objects.using(using).only("id", *INDEXED_FIELDS)
+        total = 0
+        batch = []
+        for post in queryset.iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) >= batch_size:
+                backend.index(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            backend.index(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} posts."))
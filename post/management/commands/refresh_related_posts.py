@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from post.related import refresh_pending_related_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the related posts of posts whose tags, category or "
+        "visibility changed. Web workers only mark the rows, run this from a "
+        "worker or scheduler; --watch keeps polling for new changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--watch", action="store_true")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds between polls with --watch."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            refreshed = refresh_pending_related_posts(
+                batch_size=options["batch_size"],
+                using=options["database"],
+            )
+            if refreshed or not options["watch"]:
+                self.stdout.write(f"Refreshed related posts of {refreshed} posts.")
+            if not options["watch"]:
+                break
+            time.sleep(options["interval"])
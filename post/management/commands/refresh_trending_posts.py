@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from post.counters import refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute trending scores from the recent view buckets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        trending = refresh_trending_scores(using=options["database"])
+        self.stdout.write(self.style.SUCCESS(f"{trending} posts are trending."))
@@ -0,0 +1,38 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .redirects import redirect_resolver
+
+
+class RedirectMiddleware:
+    """
+    Answers requests matching a ``Redirect`` row with 301/302/307/308/410
+    straight from the in-memory redirect table, without touching the DB.
+    """
+    methods = ("GET", "HEAD")
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.method in self.methods:
+            match = redirect_resolver.resolve(request.path_info)
+            if match is not None:
+                return self.redirect(request, match)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method in self.methods:
+            match = await redirect_resolver.aresolve(request.path_info)
+            if match is not None:
+                return self.redirect(request, match)
+        return await self.get_response(request)
+
+    def redirect(self, request, match):
+        rule, remainder = match
+        return rule.response(remainder, request.META.get("QUERY_STRING", ""))
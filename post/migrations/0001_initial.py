@@ -0,0 +1,176 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:01
+
+import django.db.models.deletion
+import django.utils.timezone
+import django_currentuser.db.models.fields
+import django_currentuser.middleware
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('title', models.CharField(max_length=100)),
+                ('slug', models.SlugField(allow_unicode=True, blank=True, null=True, unique=True, verbose_name='slug')),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+            ],
+            options={
+                'verbose_name': 'category',
+                'verbose_name_plural': 'categories',
+                'db_table': 'category',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContactMessage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('name', models.CharField(blank=True, max_length=100, null=True, verbose_name='name')),
+                ('company_name', models.CharField(blank=True, max_length=100, null=True, verbose_name='company_name')),
+                ('mobile', models.CharField(blank=True, max_length=11, null=True)),
+                ('work_field', models.CharField(blank=True, max_length=200, null=True, verbose_name='work_field')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+            ],
+            options={
+                'verbose_name': 'contact us',
+                'verbose_name_plural': 'contact us',
+                'db_table': 'contact_us',
+            },
+        ),
+        migrations.CreateModel(
+            name='Media',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='media', verbose_name='image')),
+                ('meta_og_image', models.ImageField(blank=True, null=True, upload_to='meta_images/', verbose_name='meta_og_image')),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+            ],
+            options={
+                'verbose_name': 'media',
+                'verbose_name_plural': 'media',
+                'db_table': 'media',
+            },
+        ),
+        migrations.CreateModel(
+            name='Post',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('slug', models.SlugField(allow_unicode=True, blank=True, null=True, unique=True, verbose_name='slug')),
+                ('title', models.CharField(blank=True, max_length=150, null=True, verbose_name='title')),
+                ('body', models.TextField(blank=True, null=True, verbose_name='body')),
+                ('description', models.CharField(blank=True, max_length=250, null=True, verbose_name='description')),
+                ('is_published', models.BooleanField(default=True)),
+                ('meta_title', models.CharField(blank=True, max_length=200, null=True, verbose_name='meta_title')),
+                ('meta_description', models.CharField(blank=True, max_length=300, null=True, verbose_name='meta_description')),
+                ('meta_keywords', models.CharField(blank=True, max_length=300, null=True, verbose_name='meta_keywords')),
+                ('canonical', models.CharField(blank=True, max_length=200, null=True, verbose_name='canonical')),
+                ('index', models.BooleanField(default=True)),
+                ('follow', models.BooleanField(default=False)),
+                ('alt', models.CharField(blank=True, max_length=1000, null=True, verbose_name='alt')),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='post.category')),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='post.media')),
+            ],
+            options={
+                'verbose_name': 'post',
+                'verbose_name_plural': 'posts',
+                'db_table': 'post',
+            },
+        ),
+        migrations.CreateModel(
+            name='Redirect',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('origin', models.CharField(blank=True, max_length=1000, null=True, verbose_name='origin')),
+                ('target', models.CharField(blank=True, max_length=1000, null=True, verbose_name='target')),
+                ('status', models.CharField(blank=True, max_length=1000, null=True, verbose_name='status')),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+            ],
+            options={
+                'verbose_name': 'redirect',
+                'verbose_name_plural': 'redirect',
+                'db_table': 'redirect',
+            },
+        ),
+        migrations.CreateModel(
+            name='Schema',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('content', models.TextField()),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schema_items', to='post.post')),
+            ],
+            options={
+                'verbose_name': 'schema',
+                'verbose_name_plural': 'schemas',
+                'db_table': 'schema',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True, verbose_name='unique id')),
+                ('_created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('_updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('_is_deleted', models.BooleanField(default=False)),
+                ('_deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, max_length=100, null=True, verbose_name='title')),
+                ('slug', models.SlugField(allow_unicode=True, blank=True, null=True, unique=True, verbose_name='slug')),
+                ('description', models.TextField(blank=True, null=True)),
+                ('_created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+                ('_updated_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, on_update=True, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL, verbose_name='updated by')),
+            ],
+            options={
+                'verbose_name': 'tag',
+                'verbose_name_plural': 'tags',
+                'db_table': 'tag',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='%(app_label)s_%(class)s_tags', to='post.tag', verbose_name='Tags'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:01
+
+import common.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # the GIN index is built with CREATE INDEX CONCURRENTLY, which can't
+    # run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('post', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='post',
+            index=common.indexes.PortableGinIndex(fields=['search_vector'], name='post_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0002_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='derivatives'),
+        ),
+    ]
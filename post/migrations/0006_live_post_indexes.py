@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:01
+
+import common.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built with CREATE INDEX CONCURRENTLY, which can't run
+    # inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('post', '0005_post_render_artifacts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('_is_deleted', False)), fields=['_created_at', 'id'], name='post_live_created_idx'),
+        ),
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('_is_deleted', False)), fields=['category', '_created_at'], name='post_live_category_idx'),
+        ),
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('_is_deleted', False)), fields=['is_published'], name='post_live_published_idx'),
+        ),
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('_is_deleted', False)), fields=['slug'], name='post_live_slug_idx'),
+        ),
+    ]
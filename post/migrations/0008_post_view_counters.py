@@ -0,0 +1,44 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0007_related_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewStats',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='post.post')),
+                ('view_count', models.PositiveBigIntegerField(default=0, verbose_name='view count')),
+                ('trending_score', models.FloatField(default=0, verbose_name='trending score')),
+            ],
+            options={
+                'verbose_name': 'post view stats',
+                'verbose_name_plural': 'post view stats',
+                'db_table': 'post_view_stats',
+                'indexes': [models.Index(fields=['-view_count'], name='post_stats_views_idx'), models.Index(fields=['-trending_score'], name='post_stats_trending_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='bucket')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='views')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='post.post')),
+            ],
+            options={
+                'verbose_name': 'post view bucket',
+                'verbose_name_plural': 'post view buckets',
+                'db_table': 'post_view_bucket',
+                'indexes': [models.Index(fields=['bucket'], name='post_view_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'bucket'), name='post_view_bucket_uniq')],
+            },
+        ),
+    ]
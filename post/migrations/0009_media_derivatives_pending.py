@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:10
+
+import common.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # see 0006, the index is built with CREATE INDEX CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('post', '0008_post_view_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='derivatives_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='derivatives pending'),
+        ),
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='media',
+            index=models.Index(condition=models.Q(('derivatives_pending', True)), fields=['id'], name='media_derivatives_pending_idx'),
+        ),
+    ]
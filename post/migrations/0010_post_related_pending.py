@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:36
+
+import common.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # see 0006, the index is built with CREATE INDEX CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('post', '0009_media_derivatives_pending'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='related_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='related pending'),
+        ),
+        common.indexes.PortableAddIndexConcurrently(
+            model_name='post',
+            index=models.Index(condition=models.Q(('related_pending', True)), fields=['id'], name='post_related_pending_idx'),
+        ),
+    ]
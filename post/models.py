@@ -1,8 +1,15 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import DEFERRED
 from django.contrib.auth import get_user_model
-from django.utils.text import slugify
+from django.contrib.postgres.search import SearchVectorField
 from django.shortcuts import reverse
-from common.base import GenericModel
+from common.base import GenericModel, SoftDeleteManager, SoftDeleteQuerySet
+from common.indexes import PortableGinIndex
+from common.slugs import save_with_unique_slug
+from .images import needs_derivatives
+from .redirects import redirect_resolver
+from .render import ARTIFACT_FIELDS, refresh_render_artifacts
+from .search import INDEXED_FIELDS, get_search_backend
 User=get_user_model()
 
 
@@ -72,8 +79,9 @@ class Tag(GenericModel):
 
     def save(self, *args, **kwargs):
         if not self.slug and self.title:
-            self.slug = slugify(self.title, allow_unicode=True)
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
     
     
 class Category(GenericModel):
@@ -94,8 +102,9 @@ class Category(GenericModel):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title, allow_unicode=True)
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
         
     def __str__(self):
         return self.title or "none"
@@ -114,15 +123,81 @@ class Media(GenericModel):
         null=True,
         blank=True
     )
+    derivatives = models.JSONField(
+        "derivatives",
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    width = models.PositiveIntegerField(
+        "width",
+        null=True,
+        blank=True,
+        editable=False
+    )
+    height = models.PositiveIntegerField(
+        "height",
+        null=True,
+        blank=True,
+        editable=False
+    )
+    size = models.PositiveBigIntegerField(
+        "size",
+        null=True,
+        blank=True,
+        editable=False
+    )
+    mime_type = models.CharField(
+        "mime type",
+        max_length=100,
+        blank=True,
+        default="",
+        editable=False
+    )
+    content_hash = models.CharField(
+        "content hash",
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    placeholder = models.TextField(
+        "placeholder",
+        blank=True,
+        default="",
+        editable=False
+    )
+    # set on save when a file changed, cleared by process_image_derivatives
+    derivatives_pending = models.BooleanField(
+        "derivatives pending",
+        default=False,
+        editable=False
+    )
 
     class Meta:
         verbose_name = "media"
         verbose_name_plural = "media"
         db_table = 'media'
         # ordering=["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="media_derivatives_pending_idx",
+                condition=models.Q(derivatives_pending=True),
+            ),
+        ]
 
     def __str__(self):
         return self.image.name if self.image else str(self.id)
+
+    def save(self, *args, **kwargs):
+        if needs_derivatives(self) and not self.derivatives_pending:
+            self.derivatives_pending = True
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "derivatives_pending"}
+        super().save(*args, **kwargs)
     
 
 class Post(GenericModel):
@@ -207,26 +282,155 @@ class Post(GenericModel):
         null=True,
         blank=True,
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+    body_html = models.TextField(
+        "body html",
+        blank=True,
+        default="",
+        editable=False
+    )
+    excerpt = models.CharField(
+        "excerpt",
+        max_length=250,
+        blank=True,
+        default="",
+        editable=False
+    )
+    word_count = models.PositiveIntegerField(
+        "word count",
+        default=0,
+        editable=False
+    )
+    reading_time = models.PositiveIntegerField(
+        "reading time",
+        default=0,
+        editable=False
+    )
+    toc = models.JSONField(
+        "table of contents",
+        default=list,
+        blank=True,
+        editable=False
+    )
+    body_hash = models.CharField(
+        "body hash",
+        max_length=40,
+        blank=True,
+        default="",
+        editable=False
+    )
+    # set on save and tag changes that move the related-post lists, cleared
+    # by the refresh_related_posts command
+    related_pending = models.BooleanField(
+        "related pending",
+        default=False,
+        editable=False
+    )
 
     class Meta:
         verbose_name = "post"
         verbose_name_plural = "posts"
         db_table = 'post'
         # ordering=["-created_at"]
+        # the default manager adds ``_is_deleted = false`` to every query,
+        # so the list and lookup indexes only cover live rows
+        indexes = [
+            PortableGinIndex(fields=["search_vector"], name="post_search_vector_gin"),
+            models.Index(
+                fields=["_created_at", "id"],
+                name="post_live_created_idx",
+                condition=models.Q(_is_deleted=False),
+            ),
+            models.Index(
+                fields=["category", "_created_at"],
+                name="post_live_category_idx",
+                condition=models.Q(_is_deleted=False),
+            ),
+            models.Index(
+                fields=["is_published"],
+                name="post_live_published_idx",
+                condition=models.Q(_is_deleted=False),
+            ),
+            models.Index(
+                fields=["slug"],
+                name="post_live_slug_idx",
+                condition=models.Q(_is_deleted=False),
+            ),
+            models.Index(
+                fields=["id"],
+                name="post_related_pending_idx",
+                condition=models.Q(related_pending=True),
+            ),
+        ]
+
+    # columns the related-posts table is computed from, besides tags
+    RELATED_FIELDS = ("category_id", "is_published", "_is_deleted")
+    # columns that decide which feeds list the post, besides tags
+    FEED_FIELDS = ("category_id", "is_published", "_is_deleted", "_created_at")
 
     def __str__(self):
         return self.title or 'Untitled Post'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._related_state = instance.get_related_state()
+        instance._feed_state = instance.get_feed_state()
+        instance._search_state = instance.get_search_state()
+        return instance
+
+    def get_related_state(self):
+        # deferred columns count as unknown instead of being loaded
+        return tuple(self.__dict__.get(name) for name in self.RELATED_FIELDS)
+
+    def get_feed_state(self):
+        return tuple(self.__dict__.get(name) for name in self.FEED_FIELDS)
+
+    def get_search_state(self):
+        return tuple(self.__dict__.get(name, DEFERRED) for name in INDEXED_FIELDS)
+
+    def search_index_is_stale(self):
+        state = getattr(self, "_search_state", None)
+        return state is None or DEFERRED in state or state != self.get_search_state()
     
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "body" in update_fields:
+            if refresh_render_artifacts(self) and update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | set(ARTIFACT_FIELDS)
+        related_state = self.get_related_state()
+        if getattr(self, "_related_state", None) != related_state:
+            self.related_pending = True
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"related_pending"}
+        # new posts and changed indexed text only, not every save
+        search_backend = None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & set(INDEXED_FIELDS):
+            if self.search_index_is_stale():
+                using = kwargs.get("using") or router.db_for_write(Post, instance=self)
+                search_backend = get_search_backend(using)
+        if search_backend is not None and search_backend.indexes_row:
+            self.search_vector = search_backend.get_vector(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"search_vector"}
         if not self.slug and self.title:
-            base_slug = slugify(self.title, allow_unicode=True)
-            slug = base_slug
-            counter = 1
-            while Post.objects.filter(slug=slug).exists():
-                counter += 1
-                slug = f"{base_slug}-{counter}"
-            self.slug = slug
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        if search_backend is not None:
+            if not search_backend.indexes_row:
+                search_backend.index([self])
+            self._search_state = self.get_search_state()
+        self._related_state = related_state
+
+    @property
+    def summary(self):
+        return self.description or self.excerpt
 
     def get_api_url(self):
         try:
@@ -238,6 +442,40 @@ class Post(GenericModel):
         return reverse("post_detail", kwargs={"pk": self.pk})
 
 
+class RedirectQuerySet(SoftDeleteQuerySet):
+    """
+    Bulk writes send no save/delete signals, so they refresh the redirect
+    table themselves once committed.
+    """
+
+    def invalidate_table(self):
+        transaction.on_commit(redirect_resolver.invalidate, using=self.db)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        self.invalidate_table()
+        return rows
+
+    def delete(self):
+        rows = super().delete()
+        self.invalidate_table()
+        return rows
+
+    def hard_delete(self):
+        deleted = super().hard_delete()
+        self.invalidate_table()
+        return deleted
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.invalidate_table()
+        return objs
+
+
+class RedirectManager(SoftDeleteManager):
+    queryset_class = RedirectQuerySet
+
+
 class Redirect(GenericModel):
     origin = models.CharField(
         "origin",
@@ -257,6 +495,9 @@ class Redirect(GenericModel):
         null=True,
         blank=True,
     )
+    objects = RedirectManager(alive_only=True)
+    all_objects = RedirectManager(alive_only=None)
+    deleted_objects = RedirectManager(alive_only=False)
     
     class Meta:
         verbose_name = "redirect"
@@ -284,4 +525,100 @@ class Schema(GenericModel):
         verbose_name_plural = "schemas"
 
     def __str__(self):
-        return self.content or None
\ No newline at end of file
+        return self.content or None
+
+class RelatedPost(models.Model):
+    """
+    Precomputed neighbours of a post by tag and category similarity, see
+    ``post.related``.
+    """
+    # derived rows, they don't keep the post from being deleted
+    blocks_deletion = False
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="related_links",
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    rank = models.PositiveSmallIntegerField("rank")
+    score = models.FloatField("score")
+    # when the link was last recomputed
+    _updated_at = models.DateTimeField(
+        verbose_name="updated at",
+        auto_now=True
+    )
+
+    class Meta:
+        db_table = "related_post"
+        verbose_name = "related post"
+        verbose_name_plural = "related posts"
+        ordering = ["rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["post", "rank"], name="related_post_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id}"
+
+
+class PostViewStats(models.Model):
+    """
+    View totals and the trending score of a post, kept apart from ``Post``
+    so counter writes never race editors saving the post. Written by
+    ``post.counters``.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    view_count = models.PositiveBigIntegerField("view count", default=0)
+    trending_score = models.FloatField("trending score", default=0)
+
+    class Meta:
+        db_table = "post_view_stats"
+        verbose_name = "post view stats"
+        verbose_name_plural = "post view stats"
+        indexes = [
+            models.Index(fields=["-view_count"], name="post_stats_views_idx"),
+            models.Index(fields=["-trending_score"], name="post_stats_trending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id}: {self.view_count}"
+
+
+class PostViewBucket(models.Model):
+    """
+    Views of a post within one time bucket, the input of trending scores.
+    """
+    # counter rows go with the post, see common.base.deletion_blockers
+    blocks_deletion = False
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="view_buckets",
+    )
+    bucket = models.DateTimeField("bucket")
+    views = models.PositiveIntegerField("views", default=0)
+
+    class Meta:
+        db_table = "post_view_bucket"
+        verbose_name = "post view bucket"
+        verbose_name_plural = "post view buckets"
+        constraints = [
+            models.UniqueConstraint(fields=["post", "bucket"], name="post_view_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["bucket"], name="post_view_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} @ {self.bucket}: {self.views}"
@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+from uuid import uuid4
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import (
+    HttpResponseGone,
+    HttpResponsePermanentRedirect,
+    HttpResponseRedirect
+    )
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "redirects:table-version"
+DEFAULT_STATUS = 301
+ALLOWED_STATUSES = (301, 302, 307, 308, 410)
+
+
+def normalize_path(value):
+    path = urlsplit(value.strip()).path or "/"
+    if not path.startswith("/"):
+        path = "/" + path
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return path
+
+
+def is_root_origin(origin):
+    """
+    ``/``, ``*`` and ``/*`` would redirect the home page or every path,
+    the API and admin included.
+    """
+    origin = (origin or "").strip()
+    if origin.endswith("*"):
+        origin = origin[:-1]
+    return normalize_path(origin) == "/"
+
+
+def parse_status(value):
+    try:
+        status = int(str(value).strip())
+    except (TypeError, ValueError):
+        return DEFAULT_STATUS
+    return status if status in ALLOWED_STATUSES else DEFAULT_STATUS
+
+
+class RedirectRule:
+    __slots__ = ("target", "status", "is_prefix")
+
+    def __init__(self, target, status, is_prefix=False):
+        self.target = target
+        self.status = status
+        self.is_prefix = is_prefix
+
+    def build_target(self, remainder):
+        if self.is_prefix and self.target.endswith("*"):
+            base = self.target[:-1]
+            if remainder and not base.endswith("/"):
+                base += "/"
+            return base + remainder
+        return self.target
+
+    def response(self, remainder="", query_string=""):
+        if self.status == 410:
+            return HttpResponseGone()
+        target = self.build_target(remainder)
+        if query_string and "?" not in target:
+            target = f"{target}?{query_string}"
+        if self.status == 301:
+            return HttpResponsePermanentRedirect(target)
+        response = HttpResponseRedirect(target)
+        response.status_code = self.status
+        return response
+
+
+class RedirectTable:
+    """
+    Immutable lookup table compiled from ``Redirect`` rows.
+
+    Exact origins live in a dict keyed by normalized path. Origins ending in
+    ``*`` are prefix rules stored in a trie of path segments, the longest
+    matching prefix wins.
+    """
+    RULE = object()
+
+    def __init__(self, rows=()):
+        self.exact = {}
+        self.trie = {}
+        for origin, target, status in rows:
+            self.add(origin, target, status)
+
+    def add(self, origin, target, status):
+        if not origin or is_root_origin(origin):
+            return
+        status = parse_status(status)
+        target = (target or "").strip()
+        if status != 410 and not target:
+            return
+        origin = origin.strip()
+        if origin.endswith("*"):
+            node = self.trie
+            for segment in self.split(normalize_path(origin[:-1])):
+                node = node.setdefault(segment, {})
+            node[self.RULE] = RedirectRule(target, status, is_prefix=True)
+        else:
+            self.exact[normalize_path(origin)] = RedirectRule(target, status)
+
+    @staticmethod
+    def split(path):
+        return [segment for segment in path.split("/") if segment]
+
+    def resolve(self, path):
+        """
+        Returns ``(rule, remainder)`` for ``path`` or ``None``.
+        """
+        path = normalize_path(path)
+        rule = self.exact.get(path)
+        if rule is not None:
+            return rule, ""
+        if not self.trie:
+            return None
+
+        segments = self.split(path)
+        node = self.trie
+        match = node.get(self.RULE)
+        matched_depth = 0
+        for depth, segment in enumerate(segments, start=1):
+            node = node.get(segment)
+            if node is None:
+                break
+            if self.RULE in node:
+                match = node[self.RULE]
+                matched_depth = depth
+        if match is None:
+            return None
+        return match, "/".join(segments[matched_depth:])
+
+
+class RedirectResolver:
+    """
+    Holds the compiled table for this process.
+
+    The table is swapped as a whole, so readers never see a half built one.
+    Other processes learn about changes through a version key in the cache,
+    checked at most every ``REDIRECT_TABLE_CHECK_INTERVAL`` seconds.
+    """
+
+    def __init__(self):
+        self._table = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def check_interval(self):
+        return getattr(settings, "REDIRECT_TABLE_CHECK_INTERVAL", 5)
+
+    def load_rows(self):
+        from .models import Redirect
+        return (
+            Redirect.objects
+            .order_by("_created_at")
+            .values_list("origin", "target", "status")
+        )
+
+    def rebuild(self, version=None):
+        table = RedirectTable(self.load_rows())
+        with self._lock:
+            self._table = table
+            self._version = version
+            self._checked_at = time.monotonic()
+        return table
+
+    def invalidate(self):
+        version = uuid4().hex
+        try:
+            cache.set(VERSION_CACHE_KEY, version, None)
+        except Exception:
+            # other processes pick the change up once the cache is back
+            logger.warning("Could not publish the redirect table version.", exc_info=True)
+        self.rebuild(version)
+
+    def get_table(self):
+        table = self._table
+        now = time.monotonic()
+        if table is not None and now - self._checked_at < self.check_interval:
+            return table
+        try:
+            version = cache.get(VERSION_CACHE_KEY)
+        except Exception:
+            # any cache backend error (redis, memcached...): the version is
+            # unknown, keep serving the last table and check again later
+            logger.warning("Could not read the redirect table version.", exc_info=True)
+            if table is not None:
+                self._checked_at = now
+                return table
+            version = None
+        if table is not None and version == self._version:
+            self._checked_at = now
+            return table
+        try:
+            return self.rebuild(version)
+        except DatabaseError:
+            # keep serving the last table (or none) while the database is
+            # unreachable, so requests like the health check still get through
+            self._checked_at = now
+            return table if table is not None else RedirectTable()
+
+    def resolve(self, path):
+        return self.get_table().resolve(path)
+
+    async def aresolve(self, path):
+        table = self._table
+        if table is None or time.monotonic() - self._checked_at >= self.check_interval:
+            # the version check and rebuilds use the sync cache and ORM
+            table = await sync_to_async(self.get_table)()
+        return table.resolve(path)
+
+
+redirect_resolver = RedirectResolver()
@@ -0,0 +1,274 @@
+import heapq
+from collections import defaultdict
+from math import sqrt
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from common.cache import bump_versions_on_commit, dependency_key
+from .models import Post, RelatedPost
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+RELATED_POSTS_LIMIT = 6
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+# stored scores went through the database as floats
+SCORE_TOLERANCE = 1e-9
+
+
+class Corpus:
+    """
+    Live posts as weighted feature sets, one feature per tag and one for the
+    category, newest first so equal scores favour newer posts. Only
+    published posts are candidates for a neighbour list.
+    """
+
+    def __init__(self, queryset):
+        rows = list(
+            queryset.order_by("-_created_at", "-id")
+            .values_list("id", "category_id", "is_published")
+        )
+        self.ids = [pk for pk, category_id, is_published in rows]
+        self.index = {pk: i for i, pk in enumerate(self.ids)}
+        self.candidates = [is_published for pk, category_id, is_published in rows]
+        self.features = [{} for row in rows]
+        for i, (pk, category_id, is_published) in enumerate(rows):
+            if category_id is not None:
+                self.features[i][("category", category_id)] = CATEGORY_WEIGHT
+        links = Post.tags.through.objects.using(queryset.db).filter(
+            post_id__in=queryset.values("id")
+        ).values_list("post_id", "tag_id")
+        for post_id, tag_id in links:
+            self.features[self.index[post_id]][("tag", tag_id)] = TAG_WEIGHT
+
+    def __len__(self):
+        return len(self.ids)
+
+    def norms(self):
+        return [sqrt(sum(w * w for w in features.values())) for features in self.features]
+
+
+def python_neighbours(corpus, targets, limit):
+    """
+    Cosine similarity through an inverted index over the candidates, used
+    when NumPy/SciPy are not installed.
+    """
+    norms = corpus.norms()
+    postings = defaultdict(list)
+    for j, features in enumerate(corpus.features):
+        if corpus.candidates[j]:
+            for feature, weight in features.items():
+                postings[feature].append((j, weight / norms[j]))
+    result = {}
+    for i in targets:
+        scores = defaultdict(float)
+        for feature, weight in corpus.features[i].items():
+            for j, other in postings[feature]:
+                if j != i:
+                    scores[j] += weight / norms[i] * other
+        result[i] = heapq.nsmallest(limit, ((-score, j) for j, score in scores.items()))
+        result[i] = [(j, -score) for score, j in result[i]]
+    return result
+
+
+def matrix_neighbours(corpus, targets, limit):
+    """
+    The same scores as one sparse product of the L2 normalised post x
+    feature matrix with its candidate rows.
+    """
+    columns = {}
+    rows, cols, data = [], [], []
+    for i, features in enumerate(corpus.features):
+        for feature, weight in features.items():
+            rows.append(i)
+            cols.append(columns.setdefault(feature, len(columns)))
+            data.append(weight)
+    shape = (len(corpus), max(len(columns), 1))
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=shape, dtype=numpy.float64)
+    norms = numpy.sqrt(numpy.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms) @ matrix
+    candidates = sparse.diags(numpy.asarray(corpus.candidates, dtype=numpy.float64)) @ matrix
+
+    targets = list(targets)
+    scores = (matrix[targets] @ candidates.T).tocsr()
+    result = {}
+    for row, i in enumerate(targets):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        indices, values = scores.indices[start:end], scores.data[start:end]
+        keep = (indices != i) & (values > 0)
+        indices, values = indices[keep], values[keep]
+        order = numpy.lexsort((indices, -values))[:limit]
+        result[i] = [(int(indices[k]), float(values[k])) for k in order]
+    return result
+
+
+def compute_neighbours(corpus, targets, limit=RELATED_POSTS_LIMIT):
+    """
+    ``{corpus index: [(corpus index, score), ...]}`` best first for the
+    ``targets`` corpus indexes.
+    """
+    if sparse is not None and targets:
+        return matrix_neighbours(corpus, targets, limit)
+    return python_neighbours(corpus, targets, limit)
+
+
+def store_neighbours(corpus, neighbours, using="default"):
+    """
+    Replaces the stored rows of the posts whose neighbour list changed and
+    returns their ids.
+    """
+    post_ids = [corpus.ids[i] for i in neighbours]
+    stored = defaultdict(list)
+    for post_id, related_id in (
+        RelatedPost.objects.using(using)
+        .filter(post_id__in=post_ids)
+        .order_by("post_id", "rank")
+        .values_list("post_id", "related_id")
+    ):
+        stored[post_id].append(related_id)
+
+    changed = {}
+    for i, pairs in neighbours.items():
+        related = [corpus.ids[j] for j, score in pairs]
+        if related != stored[corpus.ids[i]]:
+            changed[corpus.ids[i]] = pairs
+    if not changed:
+        return []
+    with transaction.atomic(using=using):
+        RelatedPost.objects.using(using).filter(post_id__in=list(changed)).delete()
+        RelatedPost.objects.using(using).bulk_create(
+            RelatedPost(post_id=post_id, related_id=corpus.ids[j], rank=rank, score=score)
+            for post_id, pairs in changed.items()
+            for rank, (j, score) in enumerate(pairs)
+        )
+        bump_versions_on_commit(
+            [dependency_key(Post, post_id) for post_id in changed], using=using
+        )
+    return list(changed)
+
+
+def rebuild_related_posts(batch_size=500, using="default"):
+    """
+    Recomputes the neighbours of every live post. Returns the number of
+    posts whose list changed.
+    """
+    # the rebuild covers every change marked so far
+    Post.all_objects.using(using).filter(related_pending=True).update(related_pending=False)
+    corpus = Corpus(Post.objects.using(using))
+    changed = 0
+    for start in range(0, len(corpus), batch_size):
+        targets = range(start, min(start + batch_size, len(corpus)))
+        changed += len(store_neighbours(corpus, compute_neighbours(corpus, targets), using))
+    RelatedPost.objects.using(using).exclude(post_id__in=Post.objects.using(using).values("id")).delete()
+    return changed
+
+
+def sharing_features(posts, post_ids):
+    """
+    Posts with a tag or the category of one of ``post_ids``.
+    """
+    through = Post.tags.through.objects.using(posts.db)
+    tag_ids = through.filter(post_id__in=post_ids).values("tag_id")
+    category_ids = posts.filter(pk__in=post_ids, category__isnull=False).values("category_id")
+    return posts.filter(
+        Q(pk__in=through.filter(tag_id__in=tag_ids).values("post_id"))
+        | Q(category_id__in=category_ids)
+    )
+
+
+def entering(posts, changed, limit, using):
+    """
+    Posts not listing any of ``changed`` whose list one of them now enters:
+    they score at least the last stored neighbour, or the list isn't full.
+    """
+    corpus = Corpus(posts.filter(Q(pk__in=changed) | Q(pk__in=sharing_features(posts, changed).values("id"))))
+    # best scores against the changed posts only
+    changed_indexes = {corpus.index[pk] for pk in changed if pk in corpus.index}
+    corpus.candidates = [
+        published and i in changed_indexes for i, published in enumerate(corpus.candidates)
+    ]
+    others = [i for i in range(len(corpus)) if i not in changed_indexes]
+    best = {
+        corpus.ids[i]: pairs[0][1]
+        for i, pairs in compute_neighbours(corpus, others, 1).items() if pairs
+    }
+    floors = {
+        post_id: (floor, size)
+        for post_id, floor, size in RelatedPost.objects.using(using)
+        .filter(post_id__in=list(best))
+        .values("post_id")
+        .annotate(floor=Min("score"), size=Count("id"))
+        .values_list("post_id", "floor", "size")
+    }
+    return {
+        pk for pk, score in best.items()
+        if pk not in floors or floors[pk][1] < limit or score >= floors[pk][0] - SCORE_TOLERANCE
+    }
+
+
+def refresh_related_posts(post_ids, using="default"):
+    """
+    Incremental update after the tags, category or visibility of
+    ``post_ids`` changed. Other scores don't move, so besides the posts
+    themselves only lists that held one of them, or that one of them now
+    enters, are recomputed.
+    """
+    changed = set(post_ids)
+    if not changed:
+        return []
+    posts = Post.objects.using(using)
+    affected = set(changed)
+    affected.update(
+        RelatedPost.objects.using(using).filter(related_id__in=changed).values_list("post_id", flat=True)
+    )
+    affected |= entering(posts, changed, RELATED_POSTS_LIMIT, using) - affected
+
+    # everything sharing a feature with an affected post can be a neighbour
+    corpus = Corpus(posts.filter(
+        Q(pk__in=affected) | Q(pk__in=sharing_features(posts, affected).values("id"))
+    ))
+    targets = [corpus.index[pk] for pk in affected if pk in corpus.index]
+    refreshed = store_neighbours(corpus, compute_neighbours(corpus, targets), using)
+    # posts that are gone or deleted keep no list
+    RelatedPost.objects.using(using).filter(
+        post_id__in=[pk for pk in affected if pk not in corpus.index]
+    ).delete()
+    return refreshed
+
+
+def mark_related_pending(post_ids, using="default"):
+    """
+    Queues ``post_ids`` for ``refresh_pending_related_posts``. Requests only
+    mark the rows, the lists are recomputed by a worker.
+    """
+    post_ids = list(post_ids)
+    if post_ids:
+        Post.all_objects.using(using).filter(
+            pk__in=post_ids, related_pending=False
+        ).update(related_pending=True)
+
+
+def refresh_pending_related_posts(batch_size=500, using="default"):
+    """
+    Runs ``refresh_related_posts`` over the posts marked ``related_pending``,
+    a batch per transaction that also clears the marks, so a failed batch
+    stays pending. Returns the number of posts refreshed.
+    """
+    pending = Post.all_objects.using(using).filter(related_pending=True).order_by("pk")
+    refreshed = 0
+    last_pk = None
+    while True:
+        # posts marked again meanwhile are behind the keyset, left for the next run
+        batch = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+        with transaction.atomic(using=using):
+            ids = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return refreshed
+            Post.all_objects.using(using).filter(pk__in=ids).update(related_pending=False)
+            refresh_related_posts(ids, using)
+        last_pk = ids[-1]
+        refreshed += len(ids)
@@ -0,0 +1,196 @@
+import hashlib
+import math
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+from django.utils.text import slugify
+
+# columns on Post derived from ``body``
+ARTIFACT_FIELDS = ("body_html", "excerpt", "word_count", "reading_time", "toc", "body_hash")
+WORDS_PER_MINUTE = 200
+EXCERPT_LENGTH = 250
+TOC_LEVELS = ("h2", "h3", "h4")
+
+ALLOWED_TAGS = {
+    "a", "b", "blockquote", "br", "code", "div", "em", "figcaption", "figure",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "img", "li", "ol", "p",
+    "pre", "s", "span", "strong", "sub", "sup", "table", "tbody", "td",
+    "tfoot", "th", "thead", "tr", "u", "ul",
+}
+VOID_TAGS = {"br", "hr", "img"}
+# dropped together with everything inside them
+DROPPED_TAGS = {"script", "style", "iframe", "object", "embed", "noscript", "template", "svg", "math"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title", "target", "rel"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+    "ol": {"start"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_SCHEMES = {"", "http", "https", "mailto", "tel"}
+BLOCK_TAGS = {
+    "blockquote", "br", "div", "figcaption", "figure", "h1", "h2", "h3", "h4",
+    "h5", "h6", "hr", "li", "p", "pre", "td", "th", "tr",
+}
+
+
+def safe_url(value):
+    # browsers ignore whitespace and control characters inside the scheme
+    cleaned = re.sub(r"[\x00-\x20]+", "", value)
+    try:
+        scheme = urlsplit(cleaned).scheme.lower()
+    except ValueError:
+        return False
+    return scheme in ALLOWED_SCHEMES
+
+
+class BodyRenderer(HTMLParser):
+    """
+    One pass over the CKEditor HTML: keeps allowlisted markup, gives TOC
+    headings anchor ids and collects the plain text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.text = []
+        self.toc = []
+        self.open_tags = []
+        # tag being dropped and how deeply it is nested in itself
+        self.dropped = None
+        self.dropped_depth = 0
+        self.heading = None
+        self.anchors = set()
+
+    def anchor(self, title):
+        base = slugify(title, allow_unicode=True) or "section"
+        anchor, suffix = base, 2
+        while anchor in self.anchors:
+            anchor, suffix = f"{base}-{suffix}", suffix + 1
+        self.anchors.add(anchor)
+        return anchor
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropped is not None:
+            if tag == self.dropped:
+                self.dropped_depth += 1
+            return
+        if tag in DROPPED_TAGS:
+            self.dropped, self.dropped_depth = tag, 1
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(" ")
+        if tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, ())
+        rendered = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not safe_url(value):
+                continue
+            rendered.append(f' {name}="{escape(value)}"')
+        if tag == "a" and any(name == "target" for name, value in attrs if name in allowed):
+            rendered = [part for part in rendered if not part.startswith(" rel=")]
+            rendered.append(' rel="noopener noreferrer"')
+        if tag in TOC_LEVELS and self.heading is None:
+            # the id is only known once the heading text has been read
+            self.heading = {"level": int(tag[1]), "index": len(self.output), "text": []}
+        self.output.append(f"<{tag}{''.join(rendered)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if self.dropped is not None or tag in DROPPED_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and tag in ALLOWED_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropped is not None:
+            if tag == self.dropped:
+                self.dropped_depth -= 1
+                if not self.dropped_depth:
+                    self.dropped = None
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(" ")
+        if tag not in self.open_tags:
+            return
+        # close anything left open inside, keeps the output well formed
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self.output.append(f"</{current}>")
+            if current in TOC_LEVELS and self.heading is not None:
+                self.close_heading()
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropped is not None:
+            return
+        self.output.append(escape(data, quote=False))
+        self.text.append(data)
+        if self.heading is not None:
+            self.heading["text"].append(data)
+
+    def close_heading(self):
+        heading, self.heading = self.heading, None
+        title = " ".join("".join(heading["text"]).split())
+        if not title:
+            return
+        anchor = self.anchor(title)
+        index = heading["index"]
+        self.output[index] = self.output[index].replace(">", f' id="{anchor}">', 1)
+        self.toc.append({"level": heading["level"], "id": anchor, "title": title})
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.handle_endtag(self.open_tags[-1])
+
+
+def body_digest(body):
+    return hashlib.sha1((body or "").encode("utf-8")).hexdigest()
+
+
+def excerpt_from(text, length=EXCERPT_LENGTH):
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1].rsplit(" ", 1)[0] or text[:length - 1]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def render_body(body):
+    """
+    Returns the values of ``ARTIFACT_FIELDS`` for ``body``.
+    """
+    renderer = BodyRenderer()
+    renderer.feed(body or "")
+    renderer.close()
+    text = " ".join("".join(renderer.text).split())
+    word_count = len(text.split())
+    return {
+        "body_html": "".join(renderer.output),
+        "excerpt": excerpt_from(text),
+        "word_count": word_count,
+        "reading_time": math.ceil(word_count / WORDS_PER_MINUTE),
+        "toc": renderer.toc,
+        "body_hash": body_digest(body),
+    }
+
+
+def refresh_render_artifacts(post, force=False):
+    """
+    Recomputes the artifacts of ``post`` when its body changed since they
+    were last rendered. Returns whether anything was recomputed.
+    """
+    digest = body_digest(post.body)
+    if not force and post.body_hash == digest:
+        return False
+    for name, value in render_body(post.body).items():
+        setattr(post, name, value)
+    return True
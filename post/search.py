@@ -0,0 +1,166 @@
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+# title > description/meta_description > body
+WEIGHTED_FIELDS = (
+    ("title", "A"),
+    ("description", "B"),
+    ("meta_description", "B"),
+    ("body", "C"),
+)
+INDEXED_FIELDS = tuple(name for name, weight in WEIGHTED_FIELDS)
+
+
+class BaseSearchBackend(ABC):
+    # the index is a column of the post row, set before saving so it goes
+    # out with the same INSERT/UPDATE
+    indexes_row = False
+
+    def __init__(self, using="default"):
+        self.using = using
+        self.connection = connections[using]
+
+    def setup(self):
+        pass
+
+    @abstractmethod
+    def index(self, posts):
+        pass
+
+    def remove(self, pks):
+        pass
+
+    @abstractmethod
+    def search(self, queryset, terms):
+        """
+        Filters ``queryset`` down to matches and annotates ``search_rank``,
+        higher is better.
+        """
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Weighted ``tsvector`` stored on ``Post.search_vector`` with a GIN index.
+    """
+
+    @property
+    def config(self):
+        return getattr(settings, "SEARCH_CONFIG", "simple")
+
+    indexes_row = True
+
+    def get_vector(self, post=None):
+        """
+        The weighted vector of the row's columns, or of ``post``'s unsaved
+        values.
+        """
+        vector = None
+        for name, weight in WEIGHTED_FIELDS:
+            source = name if post is None else Value(getattr(post, name) or "")
+            part = SearchVector(source, weight=weight, config=self.config)
+            vector = part if vector is None else vector + part
+        return vector
+
+    def index(self, posts):
+        from .models import Post
+        pks = [post.pk for post in posts]
+        if pks:
+            Post.all_objects.using(self.using).filter(pk__in=pks).update(
+                search_vector=self.get_vector()
+            )
+
+    def search(self, queryset, terms):
+        query = SearchQuery(" ".join(terms), search_type="websearch", config=self.config)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 shadow table, so search behaves the same in local runs and tests.
+    """
+    table = "post_search"
+    # bm25 column weights, post_id first
+    weights = (0.0, 10.0, 4.0, 4.0, 1.0)
+
+    def setup(self):
+        columns = ", ".join(INDEXED_FIELDS)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(post_id UNINDEXED, {columns}, tokenize='unicode61')"
+            )
+
+    def db_pk(self, pk):
+        from .models import Post
+        return Post._meta.pk.get_db_prep_value(pk, self.connection)
+
+    def remove(self, pks):
+        pks = [self.db_pk(pk) for pk in pks]
+        if not pks:
+            return
+        placeholders = ", ".join(["%s"] * len(pks))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE post_id IN ({placeholders})", pks
+            )
+
+    def index(self, posts):
+        posts = list(posts)
+        self.remove([post.pk for post in posts])
+        rows = [
+            [self.db_pk(post.pk)] + [
+                strip_tags(getattr(post, name) or "") for name in INDEXED_FIELDS
+            ]
+            for post in posts
+        ]
+        if not rows:
+            return
+        columns = ", ".join(("post_id",) + INDEXED_FIELDS)
+        placeholders = ", ".join(["%s"] * (len(INDEXED_FIELDS) + 1))
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})", rows
+            )
+
+    def match_expression(self, terms):
+        return " ".join('"%s"' % term.replace('"', '""') for term in terms)
+
+    def search(self, queryset, terms):
+        table = queryset.model._meta.db_table
+        weights = ", ".join(str(weight) for weight in self.weights)
+        rank = RawSQL(
+            f"SELECT -bm25({self.table}, {weights}) FROM {self.table} "
+            f"WHERE {self.table} MATCH %s AND {self.table}.post_id = {table}.id",
+            (self.match_expression(terms),),
+        )
+        return queryset.annotate(search_rank=rank).filter(search_rank__isnull=False)
+
+
+SEARCH_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_search_backend(using="default"):
+    """
+    Returns the backend for the connection's vendor, or ``None`` when full-text
+    search isn't supported there.
+    """
+    backend_class = SEARCH_BACKENDS.get(connections[using].vendor)
+    if backend_class is None:
+        return None
+    return backend_class(using)
+
+
+def update_search_index(posts, using="default"):
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.index(posts)
@@ -1,20 +1,26 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from common.base import GenericModelSerializer
+from common.fields import BatchPrimaryKeyRelatedField
+from .images import build_og_variants, build_srcset
+from .redirects import is_root_origin
 from .models import (
     Media, 
     Post, 
     ContactMessage, 
     Redirect, 
+    RelatedPost,
     Schema, 
     Tag,
     Category
     )
 from django.contrib.auth import get_user_model
-from django.utils.text import slugify
 import re
 User=get_user_model()
 
 class UserSerializer(GenericModelSerializer):
+    select_related_fields = ()
+
     class Meta:
         model = User
         fields = GenericModelSerializer.Meta.fields + (
@@ -23,6 +29,20 @@ class UserSerializer(GenericModelSerializer):
             )
 
 class MediaSerializer(GenericModelSerializer):
+    srcset = serializers.SerializerMethodField()
+    og_variants = serializers.SerializerMethodField()
+
+    field_sources = {
+        **GenericModelSerializer.field_sources,
+        "srcset": ("derivatives",),
+        "og_variants": ("derivatives",),
+    }
+    row_fields = {
+        **GenericModelSerializer.row_fields,
+        "srcset": (("derivatives",), build_srcset),
+        "og_variants": (("derivatives",), build_og_variants),
+    }
+
     class Meta:
         model = Media
         fields = GenericModelSerializer.Meta.fields + (
@@ -30,8 +50,22 @@ class MediaSerializer(GenericModelSerializer):
             "image",
             "created_at",
             "meta_og_image",
+            "width",
+            "height",
+            "size",
+            "mime_type",
+            "content_hash",
+            "placeholder",
+            "srcset",
+            "og_variants",
         )
 
+    def get_srcset(self, obj):
+        return build_srcset(obj.derivatives)
+
+    def get_og_variants(self, obj):
+        return build_og_variants(obj.derivatives)
+
 class CategorySerializer(GenericModelSerializer):
     slug = serializers.SlugField(read_only=True)
 
@@ -43,10 +77,6 @@ class CategorySerializer(GenericModelSerializer):
             'slug'
         )
 
-    def create(self, validated_data):
-        validated_data['slug'] = slugify(validated_data['title'])
-        return super().create(validated_data)
-
 class SchemaSerializer(GenericModelSerializer):
     class Meta:
         model = Schema
@@ -67,10 +97,6 @@ class TagsSerializer(GenericModelSerializer):
             "slug",
             "description"
         )
-
-    def create(self, validated_data):
-        validated_data['slug'] = slugify(validated_data['title'])
-        return super().create(validated_data)
     
 class PostSerializer(GenericModelSerializer):
     category_title = serializers.CharField(
@@ -86,6 +112,22 @@ class PostSerializer(GenericModelSerializer):
         read_only=True
         )
     image = MediaSerializer(read_only=True)
+    excerpt = serializers.CharField(source="summary", read_only=True)
+
+    field_sources = {
+        **GenericModelSerializer.field_sources,
+        "excerpt": ("description", "excerpt"),
+    }
+    row_fields = {
+        **GenericModelSerializer.row_fields,
+        "excerpt": (("description", "excerpt"), lambda description, excerpt: description or excerpt),
+    }
+
+    select_related_fields = GenericModelSerializer.select_related_fields + (
+        "category",
+        "image",
+    )
+    prefetch_related_fields = ("schema_items",)
 
     class Meta:
         model = Post
@@ -107,20 +149,13 @@ class PostSerializer(GenericModelSerializer):
             'index',
             'follow',
             "schema_items",
-            "alt"
+            "alt",
+            "excerpt",
+            "reading_time",
+            "word_count",
+            "toc",
+            "body_html",
         )
-
-    def create(self, validated_data):
-        validated_data['slug'] = slugify(validated_data['title'], allow_unicode=True)
-        base_slug = validated_data['slug']
-        unique_slug = base_slug
-        num = 1
-        while Post.objects.filter(slug=unique_slug).exists():
-            unique_slug = f"{base_slug}-{num}"
-            num += 1
-        validated_data['slug'] = unique_slug
-        
-        return super().create(validated_data)
     
 class ListPostSerializer(GenericModelSerializer):
     category_title = serializers.CharField(
@@ -135,7 +170,20 @@ class ListPostSerializer(GenericModelSerializer):
         many=True, 
         read_only=True
         )
-    image = MediaSerializer(read_only=True)  
+    image = MediaSerializer(read_only=True)
+    excerpt = serializers.CharField(source="summary", read_only=True)
+
+    field_sources = {
+        **GenericModelSerializer.field_sources,
+        "excerpt": ("description", "excerpt"),
+    }
+    row_fields = {
+        **GenericModelSerializer.row_fields,
+        "excerpt": (("description", "excerpt"), lambda description, excerpt: description or excerpt),
+    }
+
+    select_related_fields = ("category", "image")
+    prefetch_related_fields = ("schema_items",)
 
     class Meta:
         model = Post
@@ -156,23 +204,43 @@ class ListPostSerializer(GenericModelSerializer):
             'follow',
             "schema_items",
             "alt",
+            "excerpt",
+            "reading_time",
+        ]
+
+class RankedPostSerializer(ListPostSerializer):
+    view_count = serializers.IntegerField(source="stats.view_count", read_only=True)
+    trending_score = serializers.FloatField(source="stats.trending_score", read_only=True)
+
+    row_fields = {
+        **ListPostSerializer.row_fields,
+        "view_count": (("stats__view_count",), int),
+        "trending_score": (("stats__trending_score",), float),
+    }
+
+    select_related_fields = ListPostSerializer.select_related_fields + ("stats",)
+
+    class Meta(ListPostSerializer.Meta):
+        fields = ListPostSerializer.Meta.fields + [
+            "view_count",
+            "trending_score",
         ]
 
 class PostCreateUpdateSerializer(GenericModelSerializer):
-    category = serializers.PrimaryKeyRelatedField(
+    category = BatchPrimaryKeyRelatedField(
         queryset=Category.objects.all()
         )
-    schema_items = serializers.PrimaryKeyRelatedField(
+    schema_items = BatchPrimaryKeyRelatedField(
         queryset=Schema.objects.all(),
         many=True,
         required=False
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BatchPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         required=False
     )
-    image = serializers.PrimaryKeyRelatedField(
+    image = BatchPrimaryKeyRelatedField(
         queryset=Media.objects.all(), 
         required=False,
         allow_null=True
@@ -233,11 +301,70 @@ class RedirectSerializer(serializers.ModelSerializer):
             "status",
         ]
 
+    def validate_origin(self, value):
+        if value and is_root_origin(value):
+            raise serializers.ValidationError(
+                "The origin can't be the site root or a wildcard for every path."
+            )
+        return value
+
+class RelatedPostSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(source="related.id", read_only=True)
+    title = serializers.CharField(source="related.title", read_only=True)
+    slug = serializers.CharField(source="related.slug", read_only=True)
+    excerpt = serializers.CharField(source="related.summary", read_only=True)
+    reading_time = serializers.IntegerField(source="related.reading_time", read_only=True)
+
+    class Meta:
+        model = RelatedPost
+        fields = (
+            "id",
+            "title",
+            "slug",
+            "excerpt",
+            "reading_time",
+        )
+
 class DetailPostSerializer(GenericModelSerializer):
     category = CategorySerializer(read_only=True)
     tags = TagsSerializer(many=True, read_only=True)
     schema_items = SchemaSerializer(many=True, read_only=True)
     image = MediaSerializer(read_only=True)
+    excerpt = serializers.CharField(source="summary", read_only=True)
+    related_posts = RelatedPostSerializer(source="related_links", many=True, read_only=True)
+
+    field_sources = {
+        **GenericModelSerializer.field_sources,
+        "excerpt": ("description", "excerpt"),
+    }
+    row_fields = {
+        **GenericModelSerializer.row_fields,
+        "excerpt": (("description", "excerpt"), lambda description, excerpt: description or excerpt),
+    }
+
+    select_related_fields = GenericModelSerializer.select_related_fields + (
+        "category",
+        "image",
+    )
+    prefetch_related_fields = ("schema_items", "tags")
+
+    @classmethod
+    def get_prefetch_related(cls, prefix=""):
+        # one lookup on (post_id, rank) joined to the few columns shown
+        related_links = RelatedPost.objects.select_related("related").only(
+            "post_id",
+            "rank",
+            "_updated_at",
+            "related__id",
+            "related__title",
+            "related__slug",
+            "related__description",
+            "related__excerpt",
+            "related__reading_time",
+        )
+        return super().get_prefetch_related(prefix) + [
+            Prefetch(prefix + "related_links", queryset=related_links),
+        ]
 
     class Meta:
         model = Post
@@ -258,7 +385,13 @@ class DetailPostSerializer(GenericModelSerializer):
             'index',
             'follow',
             "schema_items",
-            "alt"
+            "alt",
+            "excerpt",
+            "reading_time",
+            "word_count",
+            "toc",
+            "body_html",
+            "related_posts",
         )
 
 class ContactMessageCreateSerializer(GenericModelSerializer):
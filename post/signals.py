@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from common.cache import bump_versions_on_commit, dependency_key
+from .feeds import feed_version_key
+from .models import Category, Media, Post, Redirect, Schema, Tag
+from .redirects import redirect_resolver
+from .related import mark_related_pending
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Redirect)
+@receiver(post_delete, sender=Redirect)
+def refresh_redirect_table(sender, **kwargs):
+    # soft deletes go through save(), so post_save covers them too
+    transaction.on_commit(redirect_resolver.invalidate)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.remove([instance.pk])
+
+
+@receiver(post_migrate)
+def setup_search_index(sender, using="default", **kwargs):
+    if sender.name != "post":
+        return
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.setup()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Media)
+@receiver(post_save, sender=Schema)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Media)
+@receiver(post_delete, sender=Schema)
+def bump_response_versions(sender, instance, using=None, **kwargs):
+    keys = [dependency_key(sender, instance.pk)]
+    if sender is Schema and instance.post_id:
+        keys.append(dependency_key(Post, instance.post_id))
+    bump_versions_on_commit(keys, using=using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_post_tag_versions(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    keys = [dependency_key(type(instance), instance.pk)]
+    if reverse and pk_set:
+        keys.extend(dependency_key(Post, pk) for pk in pk_set)
+    bump_versions_on_commit(keys, using=using)
+
+
+@receiver(post_save, sender=Post)
+def bump_feed_versions(sender, instance, created, using=None, **kwargs):
+    # posts already in a feed are covered by their own version, this is for
+    # posts entering one: new, published, restored, moved or redated
+    state = instance.get_feed_state()
+    if not created and getattr(instance, "_feed_state", None) == state:
+        return
+    instance._feed_state = state
+    if not instance.is_published or instance._is_deleted:
+        return
+    keys = [feed_version_key("site")]
+    if instance.category_id:
+        keys.append(feed_version_key("category", instance.category_id))
+    if not created:
+        # a new post has no tags yet, adding them bumps the tag feeds
+        keys.extend(
+            feed_version_key("tag", pk)
+            for pk in instance.tags.values_list("pk", flat=True)
+        )
+    bump_versions_on_commit(keys, using=using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_tag_feed_versions(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        keys = [feed_version_key("tag", instance.pk)]
+    else:
+        keys = [feed_version_key("tag", pk) for pk in pk_set or ()]
+    bump_versions_on_commit(keys, using=using)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def mark_related_pending_on_tags(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    # tag changes don't go through Post.save, which marks the other changes
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            mark_related_pending([instance.pk], using=using)
+    elif action == "pre_clear":
+        # a cleared tag no longer knows its posts afterwards
+        mark_related_pending(instance.post_post_tags.values_list("pk", flat=True), using=using)
+    elif action in ("post_add", "post_remove"):
+        mark_related_pending(pk_set or (), using=using)
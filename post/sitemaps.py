@@ -0,0 +1,191 @@
+from abc import ABC, abstractmethod
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Q, Window
+from django.db.models.functions import Mod, RowNumber
+from .models import Category, Post, Tag
+
+SITEMAP_MAX_URLS = 50000
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def site_url(path):
+    return settings.SITE_URL.rstrip("/") + "/" + path.lstrip("/")
+
+
+def post_location(slug, canonical=None):
+    canonical = (canonical or "").strip()
+    if canonical.startswith(("http://", "https://")):
+        return canonical
+    if canonical.startswith("/"):
+        return site_url(canonical)
+    return site_url(settings.SITEMAP_URL_PATTERNS["posts"].format(slug=slug))
+
+
+def published_posts():
+    return Post.objects.filter(is_published=True, index=True).exclude(slug=None).exclude(slug="")
+
+
+class SitemapSection(ABC):
+    """
+    One kind of URL in the sitemap, split into pages of at most
+    ``max_urls`` rows on ``(_created_at, id)``. A page starts after the key
+    that ends the previous one, so it is an index range scan however deep
+    it is; the page boundaries come from one window query and are cached
+    for ``SITEMAP_CACHE_TIMEOUT`` seconds. Rows are read with
+    ``iterator()``, which uses a server-side cursor on PostgreSQL, so
+    memory stays flat however many rows a page has.
+    """
+    name = None
+    chunk_size = 2000
+
+    @abstractmethod
+    def get_queryset(self):
+        pass
+
+    def get_rows(self):
+        return self.get_queryset().values_list("slug", "_updated_at")
+
+    def location(self, row):
+        slug = row[0]
+        return site_url(settings.SITEMAP_URL_PATTERNS[self.name].format(slug=slug))
+
+    def count(self):
+        return self.get_queryset().count()
+
+    def find_page_starts(self, max_urls):
+        """
+        ``[None, key, ...]``: for every page, the ``(_created_at, id)`` its
+        rows come after.
+        """
+        order = (F("_created_at").asc(), F("id").asc())
+        boundaries = (
+            self.get_queryset()
+            .annotate(
+                position=Window(RowNumber(), order_by=order),
+                total=Window(Count("pk")),
+            )
+            .annotate(remainder=Mod(F("position"), max_urls))
+            # the last row of every full page that has rows after it
+            .filter(remainder=0, position__lt=F("total"))
+            .order_by("position")
+            .values_list("_created_at", "id")
+        )
+        return [None, *boundaries]
+
+    def page_starts(self, max_urls=SITEMAP_MAX_URLS, refresh=False):
+        key = f"sitemap:{self.name}:{max_urls}:page-starts"
+        starts = None if refresh else cache.get(key)
+        if starts is None:
+            starts = self.find_page_starts(max_urls)
+            cache.set(key, starts, getattr(settings, "SITEMAP_CACHE_TIMEOUT", 300))
+        return starts
+
+    def page_count(self, max_urls=SITEMAP_MAX_URLS):
+        return len(self.page_starts(max_urls))
+
+    def urls(self, page=1, max_urls=SITEMAP_MAX_URLS):
+        """
+        ``(location, lastmod)`` of the page's rows; raises ``IndexError``
+        right away for pages past the last one.
+        """
+        rows = self.get_rows()
+        if page > 1:
+            created_at, pk = self.page_starts(max_urls)[page - 1]
+            rows = rows.filter(
+                Q(_created_at__gt=created_at) | Q(_created_at=created_at, id__gt=pk)
+            )
+        rows = rows.order_by("_created_at", "id")[:max_urls]
+        return (
+            (self.location(row), row[1])
+            for row in rows.iterator(chunk_size=self.chunk_size)
+        )
+
+
+class PostSitemapSection(SitemapSection):
+    name = "posts"
+
+    def get_queryset(self):
+        return published_posts()
+
+    def get_rows(self):
+        return self.get_queryset().values_list("slug", "_updated_at", "canonical")
+
+    def location(self, row):
+        return post_location(row[0], row[2])
+
+
+class CategorySitemapSection(SitemapSection):
+    name = "categories"
+
+    def get_queryset(self):
+        return Category.objects.filter(
+            Exists(published_posts().filter(category=OuterRef("pk")))
+        ).exclude(slug=None)
+
+
+class TagSitemapSection(SitemapSection):
+    name = "tags"
+
+    def get_queryset(self):
+        return Tag.objects.filter(
+            Exists(published_posts().filter(tags=OuterRef("pk")))
+        ).exclude(slug=None)
+
+
+SITEMAP_SECTIONS = {
+    section.name: section
+    for section in (PostSitemapSection(), CategorySitemapSection(), TagSitemapSection())
+}
+
+
+def sitemap_pages(max_urls=SITEMAP_MAX_URLS, refresh=False):
+    """
+    ``(section, page)`` for every sitemap file, in index order.
+    """
+    return [
+        (section, page)
+        for section in SITEMAP_SECTIONS.values()
+        for page in range(1, len(section.page_starts(max_urls, refresh=refresh)) + 1)
+    ]
+
+
+def sitemap_filename(section, page, extension=".xml"):
+    return f"sitemap-{section.name}-{page}{extension}"
+
+
+def render_urlset(urls):
+    yield XML_DECLARATION
+    yield f'<urlset xmlns="{SITEMAP_NAMESPACE}">\n'
+    for location, lastmod in urls:
+        yield "<url><loc>%s</loc>" % escape(location)
+        if lastmod is not None:
+            yield "<lastmod>%s</lastmod>" % lastmod.isoformat(timespec="seconds")
+        yield "</url>\n"
+    yield "</urlset>\n"
+
+
+def render_index(pages, extension=".xml"):
+    yield XML_DECLARATION
+    yield f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n'
+    for section, page in pages:
+        location = site_url(sitemap_filename(section, page, extension))
+        yield "<sitemap><loc>%s</loc></sitemap>\n" % escape(location)
+    yield "</sitemapindex>\n"
+
+
+def render_sitemap(max_urls=SITEMAP_MAX_URLS):
+    """
+    The ``sitemap.xml`` document: a single urlset while everything fits in
+    ``max_urls``, a sitemap index pointing at per-section files otherwise.
+    """
+    counts = {name: section.count() for name, section in SITEMAP_SECTIONS.items()}
+    if sum(counts.values()) > max_urls:
+        return render_index(sitemap_pages(max_urls))
+    return render_urlset(
+        url
+        for section in SITEMAP_SECTIONS.values()
+        for url in section.urls(1, max_urls)
+    )
@@ -1,3 +1,1253 @@
-from django.test import TestCase
+import base64
+import importlib.util
+import io
+import json
+import os
+import re
+import runpy
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock, skipIf
+from datetime import timedelta
+from uuid import uuid4
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, OperationalError, connection, transaction
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresWrapper
+from django.db.migrations import AddIndex
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from common.cache import VersionedCache, bump_versions, dependency_key, get_versions
+from common.paginations import CustomCursorPagination, CustomLimitOffsetPagination
+from common.renderers import FastJSONRenderer
+from common.rows import get_row_plan
+from common.slugs import allocate_slugs
+from .bulk import PostImporter
+from .images import DerivativePipeline
+from .models import Category, ContactMessage, Media, Post, PostViewBucket, PostViewStats, Redirect, RelatedPost, Schema, Tag
+from .contact import ContactIPThrottle, ContactMessageQueue, contact_queue, normalize_mobile
+from .counters import bucket_start, refresh_trending_scores, view_counter, write_views
+from .redirects import RedirectResolver
+from .related import Corpus, matrix_neighbours, python_neighbours, refresh_related_posts, sparse
+from .sitemaps import SITEMAP_SECTIONS, SitemapSection, sitemap_pages
+from .serializers import CategorySerializer, ListPostSerializer, MediaSerializer, TagsSerializer
+from .search import PostgresSearchBackend, SQLiteSearchBackend, get_search_backend
+from .views import PostDetailBySlugAPIView
 
-# Create your tests here.
+
+def make_post(title, **kwargs):
+    kwargs.setdefault("body", f"<p>{title} body</p>")
+    tags = kwargs.pop("tags", ())
+    post = Post.objects.create(title=title, **kwargs)
+    if tags:
+        post.tags.set(tags)
+    return post
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # views buffered by detail requests aren't written after the test
+        self.addCleanup(view_counter.take)
+
+
+class PostListTests(APITestCase):
+    url = reverse("post:list-post")
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.category = Category.objects.create(title="News")
+        self.tag = Tag.objects.create(title="Django")
+        self.old = make_post("Old", category=self.category, tags=[self.tag], _created_at=now - timedelta(days=2))
+        self.new = make_post("New", category=self.category, tags=[self.tag], _created_at=now)
+
+    def titles(self, response):
+        return [item["title"] for item in response.json()]
+
+    def test_ordering_by_created_at_alias(self):
+        response = self.client.get(self.url, {"ordering": "created_at"})
+        self.assertEqual(self.titles(response), ["Old", "New"])
+        response = self.client.get(self.url, {"ordering": "-created_at"})
+        self.assertEqual(self.titles(response), ["New", "Old"])
+
+    def test_ordering_by_field_name(self):
+        response = self.client.get(self.url, {"ordering": "_created_at"})
+        self.assertEqual(self.titles(response), ["Old", "New"])
+
+    def test_query_count_does_not_grow_with_posts(self):
+        with CaptureQueriesContext(connection) as two_posts:
+            self.client.get(self.url)
+        for index in range(5):
+            make_post(f"Post {index}", category=self.category, tags=[self.tag])
+        with CaptureQueriesContext(connection) as seven_posts:
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 7)
+        self.assertEqual(len(seven_posts), len(two_posts))
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get(self.url, {"fields": "title,slug"})
+        self.assertEqual(response.json()[0], {"title": "New", "slug": "new"})
+        response = self.client.get(self.url, {"exclude": "tags"})
+        self.assertNotIn("tags", response.json()[0])
+        self.assertIn("title", response.json()[0])
+
+    def test_unknown_sparse_fields_are_400(self):
+        for param in ("fields", "exclude"):
+            response = self.client.get(self.url, {param: "title,bogus"})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {param: ["Unknown field: bogus."]})
+        response = self.client.get(reverse("post:tags-list"), {"fields": "bogus"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TagFilterTests(APITestCase):
+    url = reverse("post:list-post")
+
+    def setUp(self):
+        super().setUp()
+        self.django = Tag.objects.create(title="Django")
+        self.python = Tag.objects.create(title="Python")
+        make_post("Both", tags=[self.django, self.python])
+        make_post("Only Django", tags=[self.django])
+        make_post("Only Python", tags=[self.python])
+        make_post("Untagged")
+
+    def titles(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(item["title"] for item in response.json())
+
+    def test_any_matches_ids_or_slugs_once(self):
+        for tags in ("django,python", f"{self.django.pk},python"):
+            self.assertEqual(
+                self.titles({"tags": tags}), ["Both", "Only Django", "Only Python"]
+            )
+        page = self.client.get(self.url, {"tags": "django,python", "limit": 10}).json()
+        self.assertEqual(page["total_items"], 3)
+
+    def test_all_needs_every_tag(self):
+        self.assertEqual(self.titles({"tags": "django,python", "tags_match": "all"}), ["Both"])
+        self.assertEqual(
+            self.titles({"tags": "django", "tags_match": "all"}), ["Both", "Only Django"]
+        )
+
+    def test_unknown_tags(self):
+        self.assertEqual(self.titles({"tags": "django,missing"}), ["Both", "Only Django"])
+        self.assertEqual(self.titles({"tags": "django,missing", "tags_match": "all"}), [])
+        self.assertEqual(self.titles({"tags": str(uuid4()), "tags_match": "all"}), [])
+        self.assertEqual(self.titles({"tags": "missing"}), [])
+
+    def test_invalid_match_is_400(self):
+        response = self.client.get(self.url, {"tags": "django", "tags_match": "some"})
+        self.assertEqual(response.status_code, 400)
+
+
+class PaginationTests(APITestCase):
+    url = reverse("post:list-post")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for index in range(3):
+            make_post(f"Post {index}")
+
+    def test_count_strategies(self):
+        exact = self.client.get(self.url, {"limit": 2}).json()
+        self.assertEqual((exact["total_items"], exact["pages_count"]), (3, 2))
+        none = self.client.get(self.url, {"limit": 2, "count": "none"}).json()
+        self.assertIsNone(none["total_items"])
+        self.assertEqual(len(none["items"]), 2)
+
+    def test_cached_count_is_reused(self):
+        self.client.get(self.url, {"limit": 2, "count": "cached"})
+        make_post("Another")
+        cached = self.client.get(self.url, {"limit": 2, "count": "cached"}).json()
+        self.assertEqual(cached["total_items"], 3)
+
+    def test_sparse_fieldsets_do_not_count_as_filters(self):
+        paginator = CustomLimitOffsetPagination()
+        factory = APIRequestFactory()
+        for params in ({"fields": "title"}, {"exclude": "body"}, {"limit": 5, "ordering": "title"}):
+            request = Request(factory.get(self.url, params))
+            self.assertFalse(paginator.is_filtered(request), params)
+        request = Request(factory.get(self.url, {"title": "Post 1"}))
+        self.assertTrue(paginator.is_filtered(request))
+
+
+class SlugTests(TestCase):
+    def test_taken_slugs_get_the_next_suffix(self):
+        Tag.objects.create(title="Django")
+        Tag.objects.create(title="Django", slug="django-2")
+        self.assertEqual(
+            allocate_slugs(Tag, ["Django", "Django", "Python"]),
+            ["django-3", "django-4", "python"],
+        )
+
+    def test_soft_deleted_and_reserved_slugs_are_taken(self):
+        Tag.objects.create(title="Gone").delete()
+        self.assertTrue(Tag.all_objects.filter(slug="gone").exists())
+        self.assertEqual(
+            allocate_slugs(Tag, ["Gone", "Kept"], reserved={"kept"}),
+            ["gone-2", "kept-2"],
+        )
+
+    def test_long_values_keep_room_for_a_suffix(self):
+        title = "a" * 80
+        first = Tag.objects.create(title=title)
+        second = Tag.objects.create(title=title)
+        max_length = Tag._meta.get_field("slug").max_length
+        self.assertEqual(len(first.slug), max_length)
+        self.assertLessEqual(len(second.slug), max_length)
+        self.assertTrue(second.slug.endswith("-2"))
+
+    def test_save_retries_when_the_slug_was_taken_concurrently(self):
+        Tag.objects.create(title="Django")
+        # the first allocation misses the row a concurrent writer just added
+        with mock.patch("common.slugs.allocate_slug", side_effect=["django", "django-2"]) as allocate:
+            tag = Tag.objects.create(title="Django")
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(tag.slug, "django-2")
+
+    def test_other_integrity_errors_are_not_retried(self):
+        tag = Tag(title="Django")
+        save = mock.Mock(side_effect=IntegrityError("not null"))
+        with mock.patch("django.db.models.Model.save", save):
+            with self.assertRaises(IntegrityError):
+                tag.save()
+        self.assertEqual(save.call_count, 1)
+
+
+class CursorPaginationTests(APITestCase):
+    url = reverse("post:list-post")
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for index in range(5):
+            make_post(f"Post {index}", _created_at=now - timedelta(minutes=index))
+
+    def page(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        return [item["title"] for item in page["items"]], page
+
+    def test_next_and_previous_round_trip(self):
+        titles, first = self.page({"pagination": "cursor", "limit": 2})
+        self.assertEqual(titles, ["Post 0", "Post 1"])
+        self.assertIsNone(first["previous_cursor"])
+        titles, second = self.page({"cursor": first["next_cursor"], "limit": 2})
+        self.assertEqual(titles, ["Post 2", "Post 3"])
+        titles, third = self.page({"cursor": second["next_cursor"], "limit": 2})
+        self.assertEqual(titles, ["Post 4"])
+        self.assertIsNone(third["next_cursor"])
+        titles, back = self.page({"cursor": third["previous_cursor"], "limit": 2})
+        self.assertEqual(titles, ["Post 2", "Post 3"])
+        titles, start = self.page({"cursor": back["previous_cursor"], "limit": 2})
+        self.assertEqual(titles, ["Post 0", "Post 1"])
+        self.assertIsNone(start["previous_cursor"])
+
+    def test_bad_cursors_are_404(self):
+        paginator = CustomCursorPagination()
+        post = Post.objects.first()
+        good = paginator.encode_cursor(post)
+        padded = good + "=" * (-len(good) % 4)
+        payload = base64.urlsafe_b64decode(padded).decode()
+        bad_id = payload.replace(str(post.pk), "not-a-uuid")
+        for token in (
+            "garbage!",
+            base64.urlsafe_b64encode(bad_id.encode()).decode(),
+            base64.urlsafe_b64encode(b'{"c":"2024-01-01T00:00:00","i":7}').decode(),
+            base64.urlsafe_b64encode(b'[1]').decode(),
+        ):
+            response = self.client.get(self.url, {"cursor": token})
+            self.assertEqual(response.status_code, 404, token)
+
+    def test_rows_and_instances_encode_alike(self):
+        paginator = CustomCursorPagination()
+        post = Post.objects.first()
+        row = {"id": post.pk, "_created_at": post._created_at, "title": post.title}
+        self.assertEqual(paginator.encode_cursor(row), paginator.encode_cursor(post))
+        self.assertEqual(
+            paginator.encode_cursor(row, reverse=True),
+            paginator.encode_cursor(post, reverse=True),
+        )
+
+
+class RedirectTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.create(origin="/old-post/", target="/new-post/", status="301")
+            Redirect.objects.create(origin="/blog/*", target="/articles/*", status="302")
+
+    def test_exact_and_prefix_redirects(self):
+        response = self.client.get("/old-post/?page=2")
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], "/new-post/?page=2")
+        response = self.client.get("/blog/2024/hello/")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], "/articles/2024/hello")
+
+    def test_queryset_delete_refreshes_the_table(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.filter(origin="/old-post/").delete()
+        self.assertEqual(self.client.get("/old-post/").status_code, 404)
+
+    def test_queryset_update_refreshes_the_table(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.filter(origin="/old-post/").update(target="/newer-post/")
+        self.assertEqual(self.client.get("/old-post/")["Location"], "/newer-post/")
+
+    def test_other_processes_rebuild_after_a_version_bump(self):
+        other_process = RedirectResolver()
+        self.assertIsNotNone(other_process.resolve("/old-post/"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.filter(origin="/old-post/").delete()
+        other_process._checked_at = 0.0
+        self.assertIsNone(other_process.resolve("/old-post/"))
+
+    def test_cache_errors_keep_the_last_table(self):
+        resolver = RedirectResolver()
+        self.assertIsNotNone(resolver.resolve("/old-post/"))
+        resolver._checked_at = 0.0
+        down = ConnectionError("cache is unreachable")
+        with mock.patch("post.redirects.cache.get", side_effect=down), \
+                self.assertNumQueries(0), self.assertLogs("post.redirects", "WARNING"):
+            self.assertIsNotNone(resolver.resolve("/old-post/"))
+        # a cold process still loads the table from the database
+        with mock.patch("post.redirects.cache.get", side_effect=down), \
+                self.assertLogs("post.redirects", "WARNING"):
+            self.assertIsNotNone(RedirectResolver().resolve("/old-post/"))
+        with mock.patch("post.redirects.cache.set", side_effect=down), \
+                self.assertLogs("post.redirects", "WARNING"):
+            with self.captureOnCommitCallbacks(execute=True):
+                Redirect.objects.filter(origin="/old-post/").delete()
+        self.assertEqual(self.client.get("/old-post/").status_code, 404)
+
+    def test_root_and_wildcard_origins_are_rejected(self):
+        for origin in ("*", "/*", "/", " /* "):
+            response = self.client.post(
+                reverse("post:redirect-list"),
+                {"origin": origin, "target": "/elsewhere/", "status": "301"},
+                format="json"
+            )
+            self.assertEqual(response.status_code, 400, origin)
+            self.assertIn("origin", response.json())
+
+    def test_catch_all_rows_are_ignored(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Redirect.objects.create(origin="/*", target="/elsewhere/", status="301")
+        self.assertEqual(self.client.get(reverse("post:list-post")).status_code, 200)
+
+
+class SearchTests(APITestCase):
+    url = reverse("post:list-post")
+
+    def setUp(self):
+        super().setUp()
+        self.in_title = make_post("Caching strategies", body="<p>Plain words</p>")
+        self.in_body = make_post("Other things", body="<p>Some caching here</p>")
+        make_post("Unrelated", body="<p>Nothing</p>")
+
+    def search(self, terms):
+        return [item["title"] for item in self.client.get(self.url, {"search": terms}).json()]
+
+    def test_search_ranks_title_matches_first(self):
+        self.assertEqual(self.search("caching"), ["Caching strategies", "Other things"])
+
+    def test_changed_text_is_reindexed(self):
+        self.in_body.body = "<p>No longer</p>"
+        self.in_body.save()
+        self.assertEqual(self.search("caching"), ["Caching strategies"])
+
+    def test_deleted_posts_leave_the_index(self):
+        self.in_title.hard_delete()
+        self.assertEqual(self.search("caching"), ["Other things"])
+
+    def test_saves_without_text_changes_skip_the_index(self):
+        post = Post.objects.get(pk=self.in_title.pk)
+        post.is_published = False
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertEqual(len(queries), 1)
+        self.assertFalse([query for query in queries if "post_search" in query["sql"]])
+
+    def test_backend_matches_the_database(self):
+        backend_class = {"postgresql": PostgresSearchBackend, "sqlite": SQLiteSearchBackend}
+        self.assertIsInstance(get_search_backend(), backend_class[connection.vendor])
+
+
+class PostgresSearchBackendTests(TestCase):
+    """
+    The PostgreSQL backend's SQL, compiled without a server; the suite on
+    PostgreSQL runs ``SearchTests`` against it too.
+    """
+
+    def compile(self, queryset):
+        postgres = PostgresWrapper({**connection.settings_dict, "OPTIONS": {}}, alias="postgres")
+        return queryset.query.get_compiler(connection=postgres).as_sql()
+
+    def test_search_uses_the_weighted_vector_and_websearch_syntax(self):
+        backend = PostgresSearchBackend()
+        sql, params = self.compile(backend.search(Post.objects.all(), ["caching", "-redis"]))
+        self.assertIn("websearch_to_tsquery", sql)
+        self.assertIn("ts_rank", sql)
+        self.assertIn("caching -redis", params)
+
+    def test_index_vector_weights_every_field(self):
+        backend = PostgresSearchBackend()
+        sql, params = self.compile(Post.objects.annotate(vector=backend.get_vector()))
+        self.assertEqual(sql.count("setweight"), 4)
+        for weight in ("A", "B", "C"):
+            self.assertIn(weight, params)
+
+    def test_saved_posts_get_their_vector_in_the_same_statement(self):
+        backend = PostgresSearchBackend()
+        post = Post(title="Caching strategies", body="<p>Plain words</p>")
+        sql, params = self.compile(Post.objects.annotate(vector=backend.get_vector(post)))
+        self.assertEqual(sql.count("setweight"), 4)
+        self.assertIn("Caching strategies", params)
+        self.assertIn("<p>Plain words</p>", params)
+
+
+class IndexMigrationTests(TestCase):
+    """
+    Index migrations compiled for PostgreSQL without a server: live tables
+    get their indexes without a write lock.
+    """
+
+    def collect_sql(self, name, previous):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        migration = loader.get_migration("post", name)
+        state = loader.project_state(("post", previous))
+        postgres = PostgresWrapper({**connection.settings_dict, "OPTIONS": {}}, alias=connection.alias)
+        with postgres.schema_editor(collect_sql=True, atomic=migration.atomic) as editor:
+            for operation in migration.operations:
+                new_state = state.clone()
+                operation.state_forwards("post", new_state)
+                # field defaults need a server to be quoted, indexes don't
+                if isinstance(operation, AddIndex):
+                    operation.database_forwards("post", editor, state, new_state)
+                state = new_state
+        return editor.collected_sql
+
+    def test_indexes_are_built_concurrently(self):
+        for name, previous, count in (
+            ("0002_post_search_vector", "0001_initial", 1),
+            ("0006_live_post_indexes", "0005_post_render_artifacts", 4),
+            ("0009_media_derivatives_pending", "0008_post_view_counters", 1),
+            ("0010_post_related_pending", "0009_media_derivatives_pending", 1),
+        ):
+            with self.subTest(name):
+                statements = self.collect_sql(name, previous)
+                self.assertEqual(len(statements), count)
+                for sql in statements:
+                    self.assertTrue(sql.startswith("CREATE INDEX CONCURRENTLY"), sql)
+
+
+class QueryPlanTests(TestCase):
+    """
+    The queries the post endpoints run on every request use the partial
+    indexes on live posts instead of reading the whole table.
+    """
+    full_scan = {
+        "postgresql": re.compile(r"\bSeq Scan on post\b"),
+        "sqlite": re.compile(r"\bSCAN post\b(?! USING (COVERING )?INDEX)"),
+    }
+
+    def plan_checks(self):
+        posts = Post.objects.all()
+        return (
+            ("latest posts", posts.order_by("-_created_at", "-id")[:20], "post_live_created_idx"),
+            (
+                "posts in a category",
+                posts.filter(category_id=uuid4()).order_by("-_created_at")[:20],
+                "post_live_category_idx",
+            ),
+            ("published posts", posts.filter(is_published=True), "post_live_published_idx"),
+            # the unique constraint on slug serves this as well as the partial index
+            ("post by slug", posts.filter(slug="slug"), None),
+            ("posts with a tag", posts.filter(tags__slug="slug").order_by("-_created_at")[:20], None),
+        )
+
+    def test_hot_post_queries_use_indexes(self):
+        if connection.vendor not in self.full_scan:
+            self.skipTest(f"no plan check for {connection.vendor}")
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # small test tables would otherwise be scanned anyway
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for label, queryset, index in self.plan_checks():
+                with self.subTest(label):
+                    plan = queryset.explain()
+                    self.assertIsNone(self.full_scan[connection.vendor].search(plan), plan)
+                    if index is not None:
+                        self.assertIn(index, plan)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.category = Category.objects.create(title="News")
+        self.tag = Tag.objects.create(title="Django")
+        self.post = make_post("Caching", category=self.category, tags=[self.tag])
+        self.other = make_post("Profiling", category=self.category, tags=[self.tag])
+        self.detail_url = reverse("post:detail-post", args=[self.post.pk])
+        self.list_url = reverse("post:list-post")
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_matching_etag_gets_304(self):
+        slug_url = reverse("post:post_detail_slug", args=[self.post.slug])
+        for url in (self.detail_url, self.list_url, slug_url):
+            etag = self.etag(url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_swapping_a_tag_changes_the_etag(self):
+        # same tag count, and the new tag is older than the old one
+        older = Tag.objects.create(title="Python", _created_at=timezone.now() - timedelta(days=1))
+        Tag.objects.filter(pk=older.pk).update(_updated_at=timezone.now() - timedelta(days=1))
+        etag = self.etag(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.set([older])
+        self.assertNotEqual(self.etag(self.detail_url), etag)
+
+    def test_related_post_title_change_changes_the_etag(self):
+        RelatedPost.objects.create(post=self.post, related=self.other, rank=1, score=1.0)
+        etag = self.etag(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.title = "Profiling Django"
+            self.other.save()
+        self.assertNotEqual(self.etag(self.detail_url), etag)
+
+    def test_new_related_links_change_the_etag(self):
+        # the ETag hashes the rendered body, related_posts included
+        etag = self.etag(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_related_posts([self.post.pk])
+        self.assertTrue(self.post.related_links.exists())
+        self.assertNotEqual(self.etag(self.detail_url), etag)
+
+    def test_queryset_update_changes_the_etag(self):
+        etag = self.etag(self.list_url)
+        # backfills write through update() and leave _updated_at alone
+        Post.objects.filter(pk=self.post.pk).update(excerpt="Backfilled")
+        self.assertNotEqual(self.etag(self.list_url), etag)
+
+    def test_list_requests_run_no_validator_aggregate(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.list_url, {"limit": 10, "count": "none"})
+        for query in queries:
+            self.assertNotIn("MAX(", query["sql"].upper())
+            self.assertNotIn("COUNT(", query["sql"].upper())
+
+
+class VersionedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = VersionedCache("test")
+        self.key = dependency_key(Post, "some-post")
+
+    def test_entries_stay_fresh_until_a_dependency_is_bumped(self):
+        self.assertEqual(self.cache.get_or_build("a", lambda: [self.key], lambda: 1), 1)
+        self.assertEqual(self.cache.get_or_build("a", lambda: [self.key], lambda: 2), 1)
+        bump_versions([self.key])
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get_or_build("a", lambda: [self.key], lambda: 3), 3)
+
+    def test_bump_during_the_build_leaves_the_entry_stale(self):
+        def build():
+            # a write commits and bumps between reading the data and storing it
+            bump_versions([self.key])
+            return "old data"
+
+        self.assertEqual(self.cache.get_or_build("a", lambda: [self.key], build), "old data")
+        self.assertIsNone(self.cache.get("a"))
+
+
+class PostDetailCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.tag = Tag.objects.create(title="Django")
+        self.other = make_post("Profiling")
+        self.post = make_post("Caching", tags=[self.tag])
+        RelatedPost.objects.create(post=self.post, related=self.other, rank=1, score=1.0)
+        self.url = reverse("post:post_detail_slug", args=[self.post.slug])
+
+    def get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeated_requests_are_served_from_the_cache(self):
+        self.get()
+        with self.assertNumQueries(0):
+            self.get()
+
+    def test_related_rows_invalidate_the_entry(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.title = "Django 5"
+            self.tag.save()
+        self.assertEqual([tag["title"] for tag in self.get()["tags"]], ["Django 5"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.title = "Profiling Django"
+            self.other.save()
+        self.assertEqual(self.get()["related_posts"][0]["title"], "Profiling Django")
+
+    def test_unknown_slug_is_404(self):
+        response = self.client.get(reverse("post:post_detail_slug", args=["missing"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_by_id_shares_the_cache_and_revalidates_without_queries(self):
+        url = reverse("post:detail-post", args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json(), self.get())
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        for missing in (uuid4(), "not-a-uuid"):
+            response = self.client.get(reverse("post:detail-post", args=[missing]))
+            self.assertEqual(response.status_code, 404)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.url)
+        last_modified = response["Last-Modified"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Last-Modified"], last_modified)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.title = "Django 5"
+            self.tag.save()
+        with mock.patch("post.views.timezone.now", return_value=timezone.now() + timedelta(seconds=5)):
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["Last-Modified"], last_modified)
+
+
+class SitemapTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        self.posts = [
+            make_post(f"Post {index}", _created_at=now - timedelta(minutes=10 - index))
+            for index in range(5)
+        ]
+        make_post("Draft", is_published=False)
+        self.section = SITEMAP_SECTIONS["posts"]
+
+    def slugs(self, urls):
+        return [location.rstrip("/").rsplit("/", 1)[-1] for location, lastmod in urls]
+
+    def test_pages_follow_each_other_without_gaps_or_overlap(self):
+        pages = [self.slugs(self.section.urls(page, max_urls=2)) for page in (1, 2, 3)]
+        self.assertEqual(pages, [
+            ["post-0", "post-1"],
+            ["post-2", "post-3"],
+            ["post-4"],
+        ])
+        self.assertEqual(self.section.page_count(max_urls=2), 3)
+        self.assertEqual(self.section.page_count(max_urls=5), 1)
+
+    def test_deep_pages_use_keyset_conditions(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(self.section.urls(3, max_urls=2))
+        page_query = queries[-1]["sql"]
+        self.assertNotIn("OFFSET", page_query.upper())
+        self.assertIn("_created_at", page_query.split("WHERE", 1)[1])
+
+    def test_out_of_range_pages_are_404(self):
+        url = reverse("sitemap-section", args=["posts", 1])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        for section, page in (("posts", 2), ("posts", 0), ("unknown", 1)):
+            url = reverse("sitemap-section", args=[section, page])
+            self.assertEqual(self.client.get(url).status_code, 404, (section, page))
+        with self.assertRaises(IndexError):
+            self.section.urls(4, max_urls=2)
+
+    def test_every_section_is_listed(self):
+        Category.objects.create(title="Empty")
+        pages = [(section.name, page) for section, page in sitemap_pages(max_urls=2)]
+        self.assertEqual(pages, [("posts", 1), ("posts", 2), ("posts", 3), ("categories", 1), ("tags", 1)])
+
+    def test_sections_must_define_a_queryset(self):
+        with self.assertRaises(TypeError):
+            SitemapSection()
+
+
+class FeedTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.tag = Tag.objects.create(title="Django")
+        self.post = make_post("Published", tags=[self.tag])
+        self.url = reverse("feed-tag-rss", args=[self.tag.slug])
+
+    def titles(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return re.findall(r"<item><title>(.*?)</title>", response.content.decode())
+
+    def test_publishing_a_tagged_post_bumps_its_tag_feeds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = make_post("Draft", is_published=False, tags=[self.tag])
+        self.assertEqual(self.titles(), ["Published"])
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.is_published = True
+            draft.save()
+        self.assertEqual(self.titles(), ["Draft", "Published"])
+
+    def test_unchanged_feed_state_skips_the_tag_lookup(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.title = "Renamed"
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        tag_queries = [query["sql"] for query in queries if "post_tags" in query["sql"]]
+        self.assertEqual(tag_queries, [])
+
+
+class PostImporterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.importer = PostImporter()
+
+    def test_upsert_onto_a_deleted_slug_restores_the_post(self):
+        post = make_post("Gone")
+        post.delete()
+        self.importer.import_chunk([{"slug": post.slug, "title": "Back"}])
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.title, "Back")
+        self.assertIsNone(post._deleted_at)
+        self.assertEqual((self.importer.updated, self.importer.restored), (0, 1))
+
+    def test_explicit_slugs_are_reserved_before_allocating(self):
+        self.importer.import_chunk([{"title": "Hello"}, {"slug": "hello", "title": "Other"}])
+        self.assertEqual(
+            dict(Post.objects.values_list("slug", "title")),
+            {"hello": "Other", "hello-2": "Hello"},
+        )
+        self.assertEqual(self.importer.created, 2)
+
+    def test_imported_posts_bump_their_tag_feeds(self):
+        tag = Tag.objects.create(title="Django")
+        url = reverse("feed-tag-rss", args=[tag.slug])
+        self.assertNotIn(b"Imported", self.client.get(url).content)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.importer.import_chunk([
+                {"title": "Imported", "is_published": True, "tags": [{"slug": tag.slug}]},
+            ])
+        self.assertIn(b"Imported", self.client.get(url).content)
+
+    def test_related_posts_are_rebuilt_once_after_the_import(self):
+        tag = Tag.objects.create(title="Django")
+        existing = make_post("Existing", tags=[tag])
+        records = [
+            {"slug": f"imported-{index}", "title": "Imported", "tags": [{"slug": tag.slug}]}
+            for index in range(3)
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as handle:
+            handle.write("\n".join(json.dumps(record) for record in records))
+        self.addCleanup(os.remove, handle.name)
+        with mock.patch("post.related.refresh_related_posts") as refresh:
+            call_command("import_posts", handle.name, "--chunk-size", "1", stdout=io.StringIO())
+        refresh.assert_not_called()
+        self.assertFalse(Post.objects.filter(related_pending=True).exists())
+        self.assertEqual(
+            RelatedPost.objects.filter(post=existing).count(), 3
+        )
+
+
+class BatchPostTests(APITestCase):
+    url = reverse("post:batch-posts")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.tag = Tag.objects.create(title="Django")
+        self.category = Category.objects.create(title="Backend")
+        self.existing = make_post("Existing", tags=[self.tag])
+
+    def write(self, items):
+        for item in items:
+            item.setdefault("category", str(self.category.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, items, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["items"]
+
+    def test_written_posts_bump_their_tag_feeds(self):
+        url = reverse("feed-tag-rss", args=[self.tag.slug])
+        self.assertNotIn(b"Batched", self.client.get(url).content)
+        self.write([{"title": "Batched", "body": "<p>x</p>", "tags": [str(self.tag.pk)]}])
+        self.assertIn(b"Batched", self.client.get(url).content)
+
+    def test_written_posts_are_searchable_and_related(self):
+        [item] = self.write([
+            {"title": "Batched caching", "body": "<p>x</p>", "tags": [str(self.tag.pk)]},
+        ])
+        titles = [
+            post["title"] for post in
+            self.client.get(reverse("post:list-post"), {"search": "caching"}).json()
+        ]
+        self.assertEqual(titles, ["Batched caching"])
+        # only marked during the request, the command scores them
+        self.assertTrue(Post.objects.get(pk=item["id"]).related_pending)
+        self.assertFalse(RelatedPost.objects.filter(post_id=item["id"]).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("refresh_related_posts", stdout=io.StringIO())
+        self.assertFalse(Post.objects.get(pk=item["id"]).related_pending)
+        self.assertTrue(
+            RelatedPost.objects.filter(post_id=item["id"], related=self.existing).exists()
+        )
+        self.assertTrue(
+            RelatedPost.objects.filter(post=self.existing, related_id=item["id"]).exists()
+        )
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 20), "red").save(buffer, "PNG")
+        self.media = Media.objects.create(
+            image=SimpleUploadedFile("red.png", buffer.getvalue(), content_type="image/png")
+        )
+        self.post = make_post("Illustrated", image=self.media)
+
+    def test_saving_a_new_file_only_marks_the_row(self):
+        self.assertTrue(Media.objects.get(pk=self.media.pk).derivatives_pending)
+        self.assertEqual(self.media.derivatives, {})
+
+    def test_processing_clears_the_flag_and_bumps_versions(self):
+        keys = [dependency_key(Media, self.media.pk), dependency_key(Post, self.post.pk)]
+        before = get_versions(keys)
+        updated_at = self.media._updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            failures = DerivativePipeline(workers=0).run([self.media.pk])
+        self.assertEqual(failures, {})
+        media = Media.objects.get(pk=self.media.pk)
+        self.assertFalse(media.derivatives_pending)
+        self.assertEqual((media.width, media.height), (40, 20))
+        self.assertIn("320w", media.derivatives["image"]["variants"])
+        self.assertGreater(media._updated_at, updated_at)
+        after = get_versions(keys)
+        self.assertTrue(all(after[key] != before[key] for key in keys))
+
+    def test_pool_failures_are_logged(self):
+        def process(media_id, render, force=False):
+            raise OSError("storage unavailable")
+
+        pipeline = DerivativePipeline(workers=1)
+        pipeline.process = process
+        with self.assertLogs("post.images", "ERROR") as logs:
+            future = pipeline.schedule(self.media.pk)
+            # waits for the done-callbacks too
+            pipeline.shutdown()
+        self.assertIsInstance(future.exception(), OSError)
+        self.assertIn(str(self.media.pk), logs.output[0])
+
+
+class RenderArtifactTests(TestCase):
+    def test_save_renders_the_body(self):
+        post = make_post("Rendered", body="<h2>Intro</h2><p>one two three</p><script>x</script>")
+        self.assertNotIn("<script>", post.body_html)
+        self.assertEqual(post.word_count, 4)
+        self.assertEqual([entry["title"] for entry in post.toc], ["Intro"])
+
+    def test_tags_and_categories_save_without_a_body(self):
+        tag = Tag.objects.create(title="Django")
+        tag.title = "Django 5"
+        tag.save()
+        Tag.objects.create()
+        Category.objects.create(title="Backend").save()
+        self.assertEqual(Tag.objects.get(pk=tag.pk).slug, "django")
+
+    def test_backfill_sets_updated_at_and_bumps_versions(self):
+        post = make_post("Backfilled")
+        Post.all_objects.filter(pk=post.pk).update(body_hash="", body_html="")
+        key = dependency_key(Post, post.pk)
+        before = get_versions([key])[key]
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("backfill_post_render", stdout=io.StringIO())
+        backfilled = Post.objects.get(pk=post.pk)
+        self.assertEqual(backfilled.body_html, post.body_html)
+        self.assertGreater(backfilled._updated_at, post._updated_at)
+        self.assertNotEqual(get_versions([key])[key], before)
+
+
+class RowPlanTests(TestCase):
+    """
+    List endpoints serve rows through RowPlan; its output must stay byte
+    for byte what the serializer renders.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(title="Backend")
+        media = Media.objects.create(image="media/cover.png")
+        tag = Tag.objects.create(title="Django")
+        make_post("Full", category=category, image=media, tags=[tag], description="About")
+        make_post("Bare", is_published=False)
+        Tag.objects.create()
+        self.request = Request(APIRequestFactory().get("/"))
+
+    def assertSameOutput(self, serializer_class, fieldset=None):
+        queryset = serializer_class.Meta.model.objects.order_by("pk")
+        plan = get_row_plan(serializer_class, fieldset)
+        self.assertIsNotNone(plan, serializer_class)
+        rows = plan.serialize(plan.values(queryset), self.request)
+        serializer = serializer_class(
+            queryset, many=True, context={"request": self.request}, fieldset=fieldset
+        )
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(rows), renderer.render(serializer.data))
+
+    def test_rows_match_the_serializers(self):
+        for serializer_class in (ListPostSerializer, TagsSerializer, CategorySerializer, MediaSerializer):
+            with self.subTest(serializer_class.__name__):
+                self.assertSameOutput(serializer_class)
+
+    def test_rows_match_with_a_fieldset(self):
+        self.assertSameOutput(ListPostSerializer, frozenset({"title", "category", "image"}))
+
+    def test_fast_renderer_matches_the_json_renderer(self):
+        data = ListPostSerializer(Post.objects.order_by("pk"), many=True).data
+        extra = {"score": 0.1, "rank": 12.5, "text": "caf\u00e9 \u2028", "when": timezone.now()}
+        for payload in (data, extra):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+
+class RelatedPostTests(TestCase):
+    def setUp(self):
+        self.django = Tag.objects.create(title="Django")
+        self.python = Tag.objects.create(title="Python")
+        self.category = Category.objects.create(title="Backend")
+        self.post = make_post("Post", category=self.category, tags=[self.django, self.python])
+        self.close = make_post("Close", category=self.category, tags=[self.django, self.python])
+        self.far = make_post("Far", tags=[self.python])
+        make_post("Draft", is_published=False, tags=[self.django, self.python])
+        refresh_related_posts(Post.objects.values_list("pk", flat=True))
+
+    def test_neighbours_rank_by_similarity(self):
+        related = RelatedPost.objects.filter(post=self.post).order_by("rank")
+        self.assertEqual([link.related for link in related], [self.close, self.far])
+
+    def pending(self):
+        return set(Post.all_objects.filter(related_pending=True).values_list("title", flat=True))
+
+    def test_changes_are_marked_for_the_worker(self):
+        Post.all_objects.update(related_pending=False)
+        self.far.refresh_from_db()
+        self.far.title = "Renamed"
+        self.far.save()
+        self.assertEqual(self.pending(), set())
+        self.far.category = self.category
+        self.far.save(update_fields=["category"])
+        self.assertEqual(self.pending(), {"Renamed"})
+        Post.all_objects.update(related_pending=False)
+        self.close.tags.remove(self.python)
+        self.assertEqual(self.pending(), {"Close"})
+        Post.all_objects.update(related_pending=False)
+        self.django.post_post_tags.clear()
+        self.assertEqual(self.pending(), {"Post", "Close", "Draft"})
+
+    def test_pending_posts_are_refreshed_by_the_command(self):
+        Post.all_objects.update(related_pending=False)
+        with mock.patch("post.related.refresh_related_posts") as refresh:
+            self.close.tags.clear()
+        refresh.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("refresh_related_posts", "--batch-size", "1", stdout=io.StringIO())
+        self.assertEqual(self.pending(), set())
+        related = RelatedPost.objects.filter(post=self.post).order_by("rank")
+        self.assertEqual([link.related for link in related], [self.far, self.close])
+
+    @skipIf(sparse is None, "NumPy/SciPy are not installed")
+    def test_matrix_and_python_scores_agree(self):
+        corpus = Corpus(Post.objects.all())
+        targets = range(len(corpus))
+        python, matrix = python_neighbours(corpus, targets, 6), matrix_neighbours(corpus, targets, 6)
+        for i in targets:
+            self.assertEqual([j for j, score in python[i]], [j for j, score in matrix[i]])
+            for (j, expected), (k, score) in zip(python[i], matrix[i]):
+                self.assertAlmostEqual(score, expected)
+
+
+class ViewCounterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.post = make_post("Viewed")
+        self.other = make_post("Older views")
+        self.url = reverse("post:post_detail_slug", args=[self.post.slug])
+
+    def test_revalidations_are_not_views(self):
+        response = self.client.get(self.url)
+        self.assertEqual(sum(view_counter.take().values()), 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(view_counter.take(), {})
+
+    def test_uncached_revalidations_are_not_views(self):
+        class OtherJSONRenderer(JSONRenderer):
+            format = "other-json"
+
+        view = PostDetailBySlugAPIView.as_view(renderer_classes=[OtherJSONRenderer])
+        factory = APIRequestFactory()
+        response = view(factory.get(self.url), slug=self.post.slug)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(view_counter.take().values()), 1)
+        response = view(factory.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]), slug=self.post.slug)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(view_counter.take(), {})
+
+    def test_trending_scores_decay_with_bucket_age(self):
+        now = timezone.now()
+        hour = timedelta(hours=1)
+        day = timedelta(days=1)
+        write_views({
+            (self.post.pk, bucket_start(now, hour)): 10,
+            (self.other.pk, bucket_start(now - day, hour)): 10,
+            (self.other.pk, bucket_start(now - 2 * day, hour)): 10,
+            (self.other.pk, bucket_start(now - 30 * day, hour)): 5,
+        })
+        with override_settings(TRENDING_HALF_LIFE_HOURS=24, TRENDING_WINDOW_DAYS=7):
+            with CaptureQueriesContext(connection) as queries:
+                trending = refresh_trending_scores(now=now)
+        self.assertEqual(trending, 2)
+        scores = dict(PostViewStats.objects.values_list("post_id", "trending_score"))
+
+        def expected(*buckets):
+            return sum(10 * 0.5 ** ((now - bucket_start(now - age, hour)).total_seconds() / 86400) for age in buckets)
+        self.assertAlmostEqual(scores[self.post.pk], expected(timedelta()))
+        self.assertAlmostEqual(scores[self.other.pk], expected(day, 2 * day))
+        self.assertEqual(PostViewBucket.objects.filter(bucket__lt=now - 7 * day).count(), 0)
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+
+    def test_expired_scores_drop_to_zero(self):
+        PostViewStats.objects.create(post=self.post, trending_score=3.0)
+        refresh_trending_scores()
+        self.assertEqual(PostViewStats.objects.get(post=self.post).trending_score, 0)
+
+
+@override_settings(CONTACT_QUEUE_SIZE=0)
+class ContactMessageTests(APITestCase):
+    url = reverse("post:create-contact_us")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def send(self, mobile="09123456789", name="Sara", **extra):
+        return self.client.post(self.url, {"mobile": mobile, "name": name}, format="json", **extra)
+
+    def test_forwarded_for_does_not_escape_the_ip_throttle(self):
+        statuses = [
+            self.send(mobile=f"0912345678{index}", HTTP_X_FORWARDED_FOR=f"10.0.0.{index}").status_code
+            for index in range(6)
+        ]
+        self.assertEqual(statuses, [201] * 5 + [429])
+        self.assertEqual(
+            set(ContactMessage.objects.values_list("ip_address", flat=True)), {"127.0.0.1"}
+        )
+
+    def test_mobile_throttle_normalizes_the_number(self):
+        for name in ("A", "B", "C"):
+            self.assertEqual(self.send(name=name).status_code, 201)
+        self.assertEqual(self.send(mobile="+98 912 345 6789", name="D").status_code, 429)
+        self.assertEqual(self.send(mobile="۰۹۱۲۳۴۵۶۷۸۹", name="E").status_code, 429)
+        self.assertEqual(normalize_mobile("0098-912-345-6789"), "9123456789")
+
+    def test_mobile_throttle_key_hides_the_number(self):
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            self.send()
+        keys = [call.args[0] for call in cache_set.call_args_list]
+        self.assertTrue(any(key.startswith("throttle_contact_mobile_") for key in keys))
+        self.assertFalse(any("9123456789" in key for key in keys))
+
+    def test_locked_bucket_is_throttled(self):
+        throttle = ContactIPThrottle()
+        key = throttle.cache_format % {"scope": throttle.scope, "ident": "127.0.0.1"}
+        cache.add(f"{key}:lock", 1)
+        self.assertEqual(self.send().status_code, 429)
+        cache.delete(f"{key}:lock")
+        self.assertEqual(self.send().status_code, 201)
+
+    def test_duplicates_get_the_earlier_id(self):
+        first = self.send()
+        self.assertEqual(first.status_code, 201)
+        again = self.send()
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()["id"], first.json()["id"])
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_failed_writes_are_503_and_can_be_retried(self):
+        with mock.patch.object(ContactMessage.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertLogs("post.contact", "ERROR"):
+                self.assertEqual(self.send().status_code, 503)
+        self.assertEqual(ContactMessage.objects.count(), 0)
+        response = self.send()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(ContactMessage.objects.filter(pk=response.json()["id"]).exists())
+
+    @override_settings(CONTACT_QUEUE_SIZE=10)
+    def test_queued_messages_are_written_once_the_queue_drains(self):
+        self.addCleanup(contact_queue.shutdown)
+        written = []
+        with mock.patch.object(
+            ContactMessage.objects, "bulk_create", side_effect=lambda messages, **kwargs: written.extend(messages)
+        ):
+            started = time.monotonic()
+            response = self.send()
+            elapsed = time.monotonic() - started
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([str(message.pk) for message in written], [response.json()["id"]])
+        # no waiting for a batch to fill
+        self.assertLess(elapsed, 0.5)
+
+    @override_settings(CONTACT_QUEUE_SIZE=10)
+    def test_messages_queued_during_a_write_make_the_next_batch(self):
+        writer = ContactMessageQueue()
+        self.addCleanup(writer.shutdown)
+        writing, release, batches = threading.Event(), threading.Event(), []
+
+        def bulk_create(messages, **kwargs):
+            batches.append(len(messages))
+            writing.set()
+            release.wait(5)
+
+        with mock.patch.object(ContactMessage.objects, "bulk_create", side_effect=bulk_create):
+            futures = [writer.put(ContactMessage(mobile="09123456789"))]
+            self.assertTrue(writing.wait(5))
+            futures += [writer.put(ContactMessage(mobile="09123456789")) for index in range(3)]
+            release.set()
+            for future in futures:
+                future.result(5)
+        self.assertEqual(batches, [1, 3])
+
+    def test_cancelled_messages_are_not_written(self):
+        future = Future()
+        future.cancel()
+        ContactMessageQueue().write([(ContactMessage(mobile="09123456789"), future)])
+        self.assertEqual(ContactMessage.objects.count(), 0)
+
+
+class DatabaseHealthTests(APITestCase):
+    url = reverse("database-health")
+
+    def test_requires_staff_or_the_token(self):
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
+        with override_settings(HEALTH_CHECK_TOKEN="secret"):
+            response = self.client.get(self.url, HTTP_X_HEALTH_CHECK_TOKEN="wrong")
+            self.assertIn(response.status_code, (401, 403))
+            response = self.client.get(self.url, HTTP_X_HEALTH_CHECK_TOKEN="secret")
+            self.assertEqual(response.status_code, 200)
+        with override_settings(HEALTH_CHECK_TOKEN=""):
+            response = self.client.get(self.url, HTTP_X_HEALTH_CHECK_TOKEN="")
+            self.assertIn(response.status_code, (401, 403))
+        staff = get_user_model().objects.create_user("ops", password="x", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertTrue(self.client.get(self.url).json()["databases"]["default"]["ok"])
+
+    def test_errors_are_reported_by_class_name(self):
+        staff = get_user_model().objects.create_user("ops", password="x", is_staff=True)
+        self.client.force_authenticate(staff)
+        failing = mock.patch.object(
+            connection, "cursor", side_effect=OperationalError("password authentication failed for ops")
+        )
+        with failing:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["databases"]["default"]["error"], "OperationalError")
+        self.assertNotIn(b"password", response.content)
+
+
+class DatabaseSettingsTests(TestCase):
+    def load_settings(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_module("config.settings")
+
+    def test_health_check_flag_accepts_common_spellings(self):
+        for value, expected in (("true", True), ("1", True), ("True", True), ("false", False), ("0", False)):
+            databases = self.load_settings(DB_CONN_HEALTH_CHECKS=value)["DATABASES"]
+            self.assertIs(databases["default"]["CONN_HEALTH_CHECKS"], expected, value)
+
+    @skipIf(importlib.util.find_spec("psycopg_pool") is None, "psycopg_pool is not installed")
+    def test_pool_checks_connections(self):
+        from psycopg_pool import ConnectionPool
+        databases = self.load_settings(DB_POOL_MAX_SIZE="4", DB_CONN_HEALTH_CHECKS="false")["DATABASES"]
+        self.assertIs(databases["default"]["OPTIONS"]["pool"]["check"], ConnectionPool.check_connection)
+
+
+class CanDeleteTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.used = Tag.objects.create(title="Used")
+        self.unused = Tag.objects.create(title="Unused")
+        make_post("Tagged", tags=[self.used])
+
+    def test_annotation_agrees_with_the_property(self):
+        tags = Tag.objects.annotate_can_delete().order_by("title")
+        self.assertEqual(
+            [(tag.title, tag._can_delete) for tag in tags],
+            [(tag.title, Tag.objects.get(pk=tag.pk).can_delete) for tag in tags],
+        )
+        self.assertEqual([tag._can_delete for tag in tags], [True, False])
+
+    def test_derived_rows_do_not_block_deletion(self):
+        post = Post.objects.get()
+        RelatedPost.objects.create(post=post, related=make_post("Other"), rank=1, score=1.0)
+        PostViewBucket.objects.create(post=post, bucket=timezone.now(), views=3)
+        PostViewStats.objects.create(post=post, view_count=3)
+        annotated = Post.objects.annotate_can_delete().get(pk=post.pk)
+        self.assertTrue(annotated._can_delete)
+        self.assertTrue(Post.objects.get(pk=post.pk).can_delete)
+        Schema.objects.create(post=post, content='{"@type": "Article"}')
+        annotated = Post.objects.annotate_can_delete().get(pk=post.pk)
+        self.assertFalse(annotated._can_delete)
+        self.assertFalse(Post.objects.get(pk=post.pk).can_delete)
+
+    def test_annotation_adds_no_queries_per_row(self):
+        with self.assertNumQueries(1):
+            list(Tag.objects.annotate_can_delete())
+        for index in range(5):
+            Tag.objects.create(title=f"Extra {index}")
+        with self.assertNumQueries(1):
+            list(Tag.objects.annotate_can_delete())
+        url = reverse("post:tags-list")
+        # loads the redirect table once
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        make_post("More", tags=list(Tag.objects.all()))
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertFalse(any(tag["can_delete"] for tag in response.json()))
+        self.assertEqual(len(many), len(few))
@@ -21,7 +21,10 @@ urlpatterns=[
     # path('admin-read-status/<uuid:pk>/', ContactMessageReadStatusUpdateView.as_view(),
     #      name='contact-read-status'),
     path("create-update-post/", CreateUpdatePostAPIView.as_view(), name="create-update-post"),
+    path("batch-posts/", BatchPostAPIView.as_view(), name="batch-posts"),
     path("list-post/", ListPostAPIView.as_view(), name="list-post"),
+    path("trending-posts/", TrendingPostsAPIView.as_view(), name="trending-posts"),
+    path("most-viewed-posts/", MostViewedPostsAPIView.as_view(), name="most-viewed-posts"),
     path("detail-post/<str:id>", PostRetrieveAPIView.as_view(), name="detail-post"),
     path("<str:slug>/", PostDetailBySlugAPIView.as_view(), name="post_detail_slug"),
 ]
\ No newline at end of file
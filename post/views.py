@@ -1,9 +1,41 @@
-from django.http import QueryDict
+import queue
+from uuid import UUID
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import Http404, HttpResponse, QueryDict, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views import View
 from rest_framework.permissions import AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from common.conditional import content_etag, not_modified_response, set_validators
+from common.filters import AliasedOrderingFilter
+from common.mixins import (
+    ConditionalGetMixin,
+    CursorPaginationMixin,
+    EagerLoadingMixin,
+    RowListMixin,
+    SparseFieldsetMixin
+    )
+from common.renderers import FastJSONRenderer
 from common.paginations import CustomLimitOffsetPagination
+from .bulk import PostBatchWriter
+from .cache import post_detail_cache, post_dependency_keys
+from .contact import (
+    ContactIPThrottle,
+    ContactMobileThrottle,
+    claim_message,
+    client_ip,
+    contact_queue,
+    message_key,
+)
+from .counters import view_counter
+from .filters import PostFilter, PostSearchFilter
+from .sitemaps import SITEMAP_SECTIONS, render_sitemap, render_urlset
 from .models import (
     Media, 
     Post,
@@ -22,73 +54,87 @@ from .serializers import (
     CategorySerializer,
     PostCreateUpdateSerializer,
     ListPostSerializer,
+    RankedPostSerializer,
     ContactMessageCreateSerializer
     )
 from rest_framework.generics import CreateAPIView, UpdateAPIView
-from rest_framework import viewsets, permissions, generics, mixins
+from rest_framework import viewsets, permissions, generics, mixins, status
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
-from rest_framework.filters import OrderingFilter, SearchFilter
 User = get_user_model()
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(
+    ConditionalGetMixin,
+    RowListMixin,
+    CursorPaginationMixin,
+    SparseFieldsetMixin,
+    EagerLoadingMixin,
+    viewsets.ModelViewSet ):
     queryset = Post.objects.all()
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     pagination_class = CustomLimitOffsetPagination
 
     filter_backends = [
         DjangoFilterBackend, 
-        OrderingFilter, 
-        SearchFilter
-        ]
-    filterset_fields = [
-        "category__slug",
-        "title", 
-        "tags__title"
+        AliasedOrderingFilter, 
+        PostSearchFilter
         ]
+    filterset_class = PostFilter
     search_fields = [
         "title",
         "slug", 
         "category__title"
         ]
     ordering_fields = [
-        "created_at", 
-        "updated_at"
+        "_created_at", 
+        "_updated_at"
         ]
-    ordering = ["-created_at"]
+    ordering_aliases = {
+        "created_at": "_created_at",
+        "updated_at": "_updated_at"
+        }
+    ordering = ["-_created_at"]
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return ListPostSerializer
         return PostCreateUpdateSerializer
     
-class ListPostAPIView(generics.ListAPIView):
+class ListPostAPIView(
+    ConditionalGetMixin,
+    RowListMixin,
+    CursorPaginationMixin,
+    SparseFieldsetMixin,
+    EagerLoadingMixin,
+    generics.ListAPIView ):
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     queryset = Post.objects.all()
     serializer_class = ListPostSerializer
     pagination_class = CustomLimitOffsetPagination
 
     filter_backends = [
         DjangoFilterBackend, 
-        OrderingFilter, 
-        SearchFilter
-        ]
-    filterset_fields = [
-        "category__slug", 
-        "title", 
-        "tags__title"
+        AliasedOrderingFilter, 
+        PostSearchFilter
         ]
+    filterset_class = PostFilter
     search_fields = [
         "title",
         "slug",
         "category__title"
     ]
     ordering_fields = [
-        "created_at", 
-        "updated_at"
+        "_created_at", 
+        "_updated_at"
         ]
-    ordering = ["-created_at"]
+    ordering_aliases = {
+        "created_at": "_created_at",
+        "updated_at": "_updated_at"
+        }
+    ordering = ["-_created_at"]
 
 class CreateUpdatePostAPIView(
     mixins.CreateModelMixin,
@@ -109,27 +155,156 @@ class CreateUpdatePostAPIView(
         return self.partial_update(request, *args, **kwargs)
 
 
-class PostRetrieveAPIView(generics.RetrieveAPIView):
+class BatchPostAPIView(generics.GenericAPIView):
+    """
+    Creates (no ``id``) and partially updates (with ``id``) many posts in one
+    request. Responds 200 when every item was written, 207 with per-item
+    errors otherwise.
+    """
+    serializer_class = PostCreateUpdateSerializer
     permission_classes = [permissions.AllowAny]
-    serializer_class = DetailPostSerializer
-    queryset = Post.objects.all()
-    lookup_field = "id"
 
-class TagsView(viewsets.ModelViewSet):
+    def post(self, request, *args, **kwargs):
+        writer = PostBatchWriter(context=self.get_serializer_context())
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Expected a list of posts."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > writer.max_items:
+            return Response(
+                {"detail": f"At most {writer.max_items} posts per batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        results = writer.write(items)
+        failed = sum(1 for result in results if result["status"] == "error")
+        return Response(
+            {
+                "created": sum(1 for result in results if result["status"] == "created"),
+                "updated": sum(1 for result in results if result["status"] == "updated"),
+                "failed": failed,
+                "items": results,
+            },
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_200_OK
+        )
+
+class TagsView(RowListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
+    pagination_class = CustomLimitOffsetPagination
 
-class CategoryView(viewsets.ModelViewSet):
+class CategoryView(RowListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    pagination_class = CustomLimitOffsetPagination
+
+class PostDetailBySlugAPIView(ConditionalGetMixin, APIView):
+    """
+    Post detail rendered once into ``post_detail_cache`` and served from
+    there, with the entry's ETag and build time as validators, so a
+    revalidation that gets a 304 costs no query and no serialization.
+    """
+    lookup_field = "slug"
+    viewed_post_id = None
+
+    def get(self, request, **kwargs):
+        lookup = {self.lookup_field: self.get_lookup_value(kwargs[self.lookup_field])}
+        if request.accepted_renderer.format != "json":
+            return self.get_uncached(request, lookup)
+        entry = post_detail_cache.get_or_build(
+            self.get_cache_key(lookup),
+            lambda: post_dependency_keys(**lookup),
+            lambda: self.build_entry(lookup)
+        )
+        self.viewed_post_id = entry.get("id")
+        last_modified = entry.get("last_modified")
+        response = not_modified_response(request, entry["etag"], last_modified)
+        if response is None:
+            response = HttpResponse(entry["content"], content_type="application/json")
+            set_validators(response, entry["etag"], last_modified)
+        return response
+
+    def get_lookup_value(self, value):
+        return value
 
-class PostDetailBySlugAPIView(APIView):
-    def get(self, request, slug):
-        post = get_object_or_404(Post, slug=slug)
-        serializer = DetailPostSerializer(post)
-        return Response(serializer.data)
+    def get_cache_key(self, lookup):
+        return lookup[self.lookup_field]
+
+    def get_post(self, lookup):
+        queryset = DetailPostSerializer.setup_eager_loading(Post.objects.all())
+        return get_object_or_404(queryset, **lookup)
+
+    def build_entry(self, lookup):
+        post = self.get_post(lookup)
+        content = JSONRenderer().render(DetailPostSerializer(post).data)
+        return {
+            "id": post.pk,
+            "content": content,
+            "etag": content_etag(content),
+            # rebuilt whenever a rendered row changes, so this is when the
+            # body last changed as far as any client can tell
+            "last_modified": timezone.now(),
+        }
+
+    def get_uncached(self, request, lookup):
+        post = self.get_post(lookup)
+        self.viewed_post_id = post.pk
+        return Response(DetailPostSerializer(post).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # a 304 revalidates a copy the client already has, it is no new view
+        if request.method == "GET" and response.status_code == 200 and self.viewed_post_id:
+            view_counter.record(self.viewed_post_id)
+        return response
+
+class PostRetrieveAPIView(PostDetailBySlugAPIView):
+    """
+    The same cached detail looked up by id.
+    """
+    lookup_field = "id"
+
+    def get_lookup_value(self, value):
+        try:
+            return UUID(value)
+        except ValueError:
+            raise Http404
+
+    def get_cache_key(self, lookup):
+        # slugs can't contain ":", so the two lookups never share a key
+        return f"id:{lookup['id']}"
+
+class TrendingPostsAPIView(
+    RowListMixin,
+    SparseFieldsetMixin,
+    EagerLoadingMixin,
+    generics.ListAPIView ):
+    """
+    Published posts by their precomputed trending score, see
+    ``post.counters``.
+    """
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    queryset = Post.objects.filter(
+        is_published=True,
+        stats__trending_score__gt=0
+        ).order_by("-stats__trending_score", "-_created_at")
+    serializer_class = RankedPostSerializer
+    pagination_class = CustomLimitOffsetPagination
+
+class MostViewedPostsAPIView(TrendingPostsAPIView):
+    """
+    Published posts by their flushed view count.
+    """
+    queryset = Post.objects.filter(
+        is_published=True,
+        stats__view_count__gt=0
+        ).order_by("-stats__view_count", "-_created_at")
 
 class RedirectViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
@@ -137,23 +312,81 @@ class RedirectViewSet(viewsets.ModelViewSet):
     serializer_class = RedirectSerializer
     pagination_class = CustomLimitOffsetPagination
 
-class SchemaViewSet(viewsets.ModelViewSet):
+class SchemaViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Schema.objects.all()
     serializer_class = SchemaSerializer
     permission_classes = [permissions.AllowAny]
 
-class MediaViewSet(viewsets.ModelViewSet):
+class MediaViewSet(RowListMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Media.objects.all()
     serializer_class = MediaSerializer
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
 class ContactMessageCreateView(CreateAPIView):
+    """
+    Hands the message to the background writer and responds 201 once it is
+    committed, 503 when the queue is full or the write fails. Throttled per
+    IP and per mobile; the same message again within
+    ``CONTACT_DUPLICATE_WINDOW`` gets a 200 with the earlier message's id
+    and is not stored twice.
+    """
     serializer_class = ContactMessageCreateSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [ContactIPThrottle, ContactMobileThrottle]
     queryset = ContactMessage.objects.all()
 
-    def perform_create(self, serializer):
-        serializer.save(
-            ip_address=self.request.META.get('REMOTE_ADDR')
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message = ContactMessage(
+            **serializer.validated_data,
+            ip_address=client_ip(request, ContactIPThrottle())
         )
+        key = message_key(serializer.validated_data)
+        earlier = claim_message(key, message.pk)
+        if earlier is not None:
+            message.pk = earlier
+            serializer.instance = message
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            self.write(message)
+        except (queue.Full, FutureTimeoutError, DatabaseError):
+            cache.delete(key)
+            return Response(
+                {"detail": "Too many messages right now, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "5"}
+            )
+        serializer.instance = message
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def write(self, message):
+        """
+        Queues ``message`` and waits until it is committed; raises when it
+        is not.
+        """
+        future = contact_queue.put(message)
+        timeout = getattr(settings, "CONTACT_WRITE_TIMEOUT", 5.0)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # still queued: drop it; already being written: see it through
+            if future.cancel():
+                raise
+            return future.result(timeout)
+
+class SitemapView(View):
+    def get(self, request):
+        return StreamingHttpResponse(render_sitemap(), content_type="application/xml")
 
+class SitemapSectionView(View):
+    def get(self, request, section, page):
+        sitemap_section = SITEMAP_SECTIONS.get(section)
+        if sitemap_section is None or page < 1:
+            raise Http404
+        try:
+            urls = sitemap_section.urls(page)
+        except IndexError:
+            raise Http404
+        return StreamingHttpResponse(render_urlset(urls), content_type="application/xml")